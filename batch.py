@@ -0,0 +1,314 @@
+"""Run levels without graphics and report statistics for each run.
+
+Usage:
+    python batch.py [--level N|FILE ...] [--board FILE] [--size COLUMNSxROWS]
+                    [--engine NAME ...] [--rule NAME] [--seed N ...]
+                    [--seeds START:STOP] [--generations N]
+                    [--place GEN:X,Y ...] [--script FILE] [--ensemble]
+                    [--format json|csv]
+
+Every combination of level (or board), engine and seed is run once, for
+the given number of generations or until there are no red cells left.
+Green cells can be placed at given generations, subject to the same
+birth budget as in the game. A run whose board settles into a still life
+or cycle, with no placements left to make, is stopped early and its
+outcome extrapolated.
+Without --seed or --seeds, every run draws a fresh seed, which is
+reported like a given one.
+
+With --ensemble, all seeds of a level are run together as one NumPy
+Ensemble instead of one TPGameOfLife per engine and seed, and aggregate
+statistics for each level are printed to stderr as JSON lines.
+"""
+import argparse
+import csv
+import itertools
+import json
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from golg import (ENGINES, RULES, CycleDetector, Ensemble, LevelIndex,
+                  TPGameOfLife, load_level, read_level_info)
+
+
+# Statistics reported for every run, in order
+FIELDS = ['level', 'engine', 'seed', 'columns', 'rows', 'generations',
+          'win', 'red', 'green', 'placed', 'rejected', 'cycle_start',
+          'period', 'seconds', 'generations_per_second']
+
+
+def parse_size(size: str) -> Tuple[int, int]:
+    """Turn a string like '51x39' into a (columns, rows) tuple."""
+    columns, rows = size.lower().split('x')
+    return int(columns), int(rows)
+
+
+def parse_placement(placement: str) -> Tuple[int, int, int]:
+    """Turn a string like '3:10,12' into a (generation, x, y) tuple."""
+    generation, coordinates = placement.split(':')
+    x, y = coordinates.split(',')
+    return int(generation), int(x), int(y)
+
+
+def parse_seeds(seeds: str) -> range:
+    """Turn a string like '0:100' into a range of seeds."""
+    start, stop = seeds.split(':')
+    return range(int(start), int(stop))
+
+
+def read_script(path: str) -> List[Tuple[int, int, int]]:
+    """Return the placements in a file with one 'GENERATION X Y' per line.
+
+    Blank lines and lines starting with '#' are ignored.
+    """
+    placements = []
+    with open(path) as script:
+        for line in script:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                generation, x, y = line.split()
+                placements.append((int(generation), int(x), int(y)))
+    return placements
+
+
+def read_board(path: str) -> Tuple[int, int, List[Tuple[int, int, int]]]:
+    """Return the columns, rows and live cells (x, y, state) of a board
+    saved in the format of TPGameOfLife.print.
+    """
+    with open(path) as board:
+        lines = [line.rstrip('\n') for line in board if line.strip()]
+    columns = max(len(line) for line in lines)
+    rows = len(lines)
+    states = {char: state for state, char
+              in enumerate(TPGameOfLife.CHARACTERS) if state}
+    cells = []
+    for row, line in enumerate(lines):
+        for x, char in enumerate(line):
+            if char in states:
+                cells.append((x, rows-1 - row, states[char]))
+    return columns, rows, cells
+
+
+def run(tpgol: TPGameOfLife, starting_births: int, max_births: int,
+        generations: int,
+        placements: List[Tuple[int, int, int]] = ()) -> Dict[str, object]:
+    """Play tpgol for up to the given number of generations, or until no red
+    cells are left, and return statistics about the run.
+
+    placements are (generation, x, y) tuples of green cells to place. As in
+    the game, a placement needs an available birth and a dead cell, and one
+    birth is regained (up to max_births) every generation.
+
+    Once the board repeats itself with no placements left to make, the run
+    is cut short: only the generations needed to reach the same point in
+    the cycle as the last generation are ticked.
+    """
+    by_generation = {}
+    for generation, x, y in placements:
+        by_generation.setdefault(generation, []).append((x, y))
+    last_placement = max(by_generation, default=-1)
+
+    births = starting_births
+    placed = 0
+    rejected = 0
+    win = None
+    generation = 0
+    ticks = 0
+    detector = CycleDetector(tpgol)
+    start = time.perf_counter()
+    while True:
+        if generation in by_generation:
+            for x, y in by_generation[generation]:
+                if (births >= 1 and tpgol.contains(x, y) and
+                    tpgol.get_state(x, y) == tpgol.DEAD):
+                    tpgol.set_state(x, y, tpgol.GREEN)
+                    births -= 1
+                    placed += 1
+                else:
+                    rejected += 1
+            detector.reset()
+        if not tpgol.population(tpgol.RED):
+            win = generation
+            break
+        if generation >= generations:
+            break
+        if births < max_births:
+            births += 1
+        tpgol.tick()
+        ticks += 1
+        generation += 1
+        if detector.update() and generation > last_placement:
+            # Every generation of the cycle had red cells, or the run would
+            # have been won, so it never will be
+            remainder = (generations - generation) % detector.cycle[1]
+            tpgol.advance(remainder)
+            ticks += remainder
+            generation = generations
+            break
+    seconds = time.perf_counter() - start
+    cycle_start, period = detector.cycle or (None, None)
+
+    return {
+        'columns': tpgol.columns,
+        'rows': tpgol.rows,
+        'generations': generation,
+        'win': win,
+        'red': tpgol.population(tpgol.RED),
+        'green': tpgol.population(tpgol.GREEN),
+        'placed': placed,
+        'rejected': rejected,
+        'cycle_start': cycle_start,
+        'period': period,
+        'seconds': round(seconds, 6),
+        'generations_per_second': (round(ticks / seconds, 1) if seconds
+                                   else None),
+    }
+
+
+def run_ensemble(states: bytes, columns: int, rows: int, starting_births: int,
+                 max_births: int, generations: int,
+                 placements: List[Tuple[int, int, int]],
+                 seeds: List[int], rule: str = 'p2life'
+                 ) -> Tuple[List[Dict[str, object]], Dict[str, object]]:
+    """Play a board once per seed, all at once in an Ensemble, and return
+    statistics about every run (like those of run) and aggregate ones.
+    """
+    ensemble = Ensemble(columns, rows, seeds, RULES[rule])
+    ensemble.set_states(states)
+    start = time.perf_counter()
+    results = ensemble.run(generations, starting_births, max_births,
+                           [placements] * len(seeds))
+    seconds = time.perf_counter() - start
+
+    runs = []
+    for board, seed in enumerate(seeds):
+        stats = {field: results[field][board].item() for field in
+                 ['generations', 'win', 'red', 'green', 'placed', 'rejected',
+                  'cycle_start', 'period']}
+        if stats['win'] < 0:
+            stats['win'] = None
+        if not stats['period']:
+            stats['cycle_start'] = stats['period'] = None
+        # A board without a seed reports the one the Ensemble drew
+        if seed is None:
+            seed = ensemble.seeds[board].item()
+        stats.update(seed=seed, columns=columns, rows=rows,
+                     seconds=round(seconds / len(seeds), 6),
+                     generations_per_second=(round(
+                         ensemble.generation * len(seeds) / seconds, 1)
+                         if seconds else None))
+        runs.append(stats)
+    summary = ensemble.summary(results)
+    summary['seconds'] = round(seconds, 6)
+    return runs, summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--level', action='append',
+                        help='built-in level number or level file to run '
+                             '(repeatable, default all built-in levels)')
+    parser.add_argument('--board', help='run a board saved by '
+                                        'TPGameOfLife.print instead')
+    parser.add_argument('--births', type=int, default=0,
+                        help='starting births for --board')
+    parser.add_argument('--max-births', type=int, default=0,
+                        help='maximum births for --board')
+    parser.add_argument('--size', type=parse_size,
+                        help='board size for levels as COLUMNSxROWS '
+                             '(default the size of the level)')
+    parser.add_argument('--engine', action='append', choices=list(ENGINES),
+                        help='engine to use (repeatable, default python)')
+    parser.add_argument('--rule', choices=list(RULES), default='p2life',
+                        help='rule the cells follow')
+    parser.add_argument('--seed', action='append', type=int,
+                        help='coin flip seed (repeatable)')
+    parser.add_argument('--seeds', type=parse_seeds,
+                        help='range of coin flip seeds as START:STOP')
+    parser.add_argument('--generations', type=int, default=1000,
+                        help='maximum number of generations per run')
+    parser.add_argument('--place', action='append', type=parse_placement,
+                        default=[], help='green placement as GEN:X,Y '
+                                         '(repeatable)')
+    parser.add_argument('--script', help='file of placements, one '
+                                         '"GEN X Y" per line')
+    parser.add_argument('--ensemble', action='store_true',
+                        help='run all seeds of a level at once with NumPy')
+    parser.add_argument('--format', choices=['json', 'csv'], default='json',
+                        help='output JSON lines or CSV')
+    args = parser.parse_args()
+
+    placements = list(args.place)
+    if args.script:
+        placements.extend(read_script(args.script))
+    seeds = list(args.seed or [])
+    if args.seeds:
+        seeds.extend(args.seeds)
+    if args.board:
+        board = read_board(args.board)
+        levels = [args.board]
+    else:
+        index = LevelIndex()
+        levels = args.level or [str(number) for number in
+                                range(1, len(index)+1)]
+
+    if args.format == 'csv':
+        writer = csv.DictWriter(sys.stdout, FIELDS)
+        writer.writeheader()
+
+    def report(stats: Dict[str, object]) -> None:
+        """Print the statistics of a run."""
+        if args.format == 'csv':
+            writer.writerow(stats)
+        else:
+            print(json.dumps({field: stats[field] for field in FIELDS}))
+        sys.stdout.flush()
+
+    for level in levels:
+        level_number = int(level) if level.isdigit() else level
+        if args.board:
+            columns, rows, cells = board
+            starting_births, max_births = args.births, args.max_births
+        else:
+            if level.isdigit():
+                info = index.level(int(level))
+            else:
+                info = read_level_info(level)
+            columns, rows = args.size or (info.columns, info.rows)
+            starting_births, max_births = info.starting_births, info.max_births
+
+        def setup(tpgol: TPGameOfLife) -> None:
+            """Set up the board of the level on tpgol."""
+            if args.board:
+                for x, y, state in cells:
+                    tpgol.set_state(x, y, state)
+            else:
+                load_level(tpgol, info)
+
+        if args.ensemble:
+            tpgol = TPGameOfLife(columns, rows)
+            setup(tpgol)
+            runs, summary = run_ensemble(
+                tpgol.states(), columns, rows, starting_births, max_births,
+                args.generations, placements, seeds or [None], args.rule)
+            for stats in runs:
+                stats.update(level=level_number, engine='ensemble')
+                report(stats)
+            summary.update(level=level_number)
+            print(json.dumps(summary), file=sys.stderr)
+            continue
+
+        for engine, seed in itertools.product(args.engine or ['python'],
+                                              seeds or [None]):
+            tpgol = TPGameOfLife(columns, rows, engine, seed, args.rule)
+            setup(tpgol)
+            stats = run(tpgol, starting_births, max_births, args.generations,
+                        placements)
+            tpgol.close()
+            stats.update(level=level_number, engine=engine,
+                         seed=tpgol.engine.seed)
+            report(stats)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,374 @@
+"""Benchmarks for TPGameOfLife engines and the game's rendering.
+
+Usage:
+    python bench.py memory [--size COLUMNSxROWS ...] [--engine NAME ...]
+    python bench.py sparse [--size COLUMNSxROWS ...] [--engine NAME ...]
+    python bench.py scaling [--size COLUMNSxROWS ...] [--workers N]
+    python bench.py tick [--size COLUMNSxROWS ...] [--engine NAME ...]
+                         [--pattern NAME ...]
+    python bench.py render [--size COLUMNSxROWS ...] [--engine NAME ...]
+    python bench.py suite [--size COLUMNSxROWS ...] [--engine NAME ...]
+    python bench.py compare OLD NEW [--threshold FRACTION]
+
+Every benchmark prints its results, and --output saves them as JSON so
+that two runs (e.g. of two commits or engines) can be compared with
+compare. Lower values are better for every benchmark.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+from golg import ENGINES, LevelIndex, TPGameOfLife, load_level
+
+
+# Sizes used by tick and suite when none are given
+TICK_SIZES = [(51, 39), (256, 256), (1024, 1024), (4096, 4096)]
+# Patterns used by tick and suite: the built-in levels and random soups
+PATTERNS = (['level-{}'.format(level) for level in range(1, 7)]
+            + ['soup-0.1', 'soup-0.3', 'soup-0.5'])
+# Skip larger sizes for an engine once a tick takes longer than this
+MAX_TICK_SECONDS = 2.0
+
+
+def parse_size(size: str) -> Tuple[int, int]:
+    """Turn a string like '51x39' into a (columns, rows) tuple."""
+    columns, rows = size.lower().split('x')
+    return int(columns), int(rows)
+
+
+def format_size(columns: int, rows: int) -> str:
+    """Turn columns and rows into a string like '51x39'."""
+    return '{}x{}'.format(columns, rows)
+
+
+def result(benchmark: str, engine: str, columns: int, rows: int,
+           pattern: str, value: float, unit: str,
+           **extra) -> Dict[str, object]:
+    """Return one benchmark result as a dict, printing it as well."""
+    record = {'benchmark': benchmark, 'engine': engine,
+              'size': format_size(columns, rows), 'pattern': pattern,
+              'value': value, 'unit': unit}
+    record.update(extra)
+    print('{:>8} {:>12} {:>11} {:>10} {:12.4f} {}'.format(
+        benchmark, engine, record['size'], pattern, value, unit))
+    sys.stdout.flush()
+    return record
+
+
+def random_soup(tpgol: TPGameOfLife, density: float = 0.3,
+                seed: int = 0) -> None:
+    """Fill tpgol with red and green cells at random, in equal numbers."""
+    rng = random.Random(seed)
+    cells = tpgol.columns * tpgol.rows
+    noise = rng.getrandbits(8*cells).to_bytes(cells, 'little')
+    # Bytes below the threshold become live, alternating red and green
+    threshold = int(density * 256)
+    table = bytes((tpgol.RED if byte % 2 else tpgol.GREEN)
+                  if byte < threshold else tpgol.DEAD for byte in range(256))
+    tpgol.set_states(noise.translate(table))
+
+
+def glider_field(tpgol: TPGameOfLife, spacing: int = 100) -> None:
+    """Place a red glider every spacing cells along the diagonal of tpgol."""
+    for offset in range(0, min(tpgol.columns, tpgol.rows) - 3, spacing):
+        tpgol.modify_cells(tpgol.RED, [(offset+1, offset),
+                                       (offset+2, offset+1),
+                                       (offset, offset+2),
+                                       (offset+1, offset+2),
+                                       (offset+2, offset+2)])
+
+
+def apply_pattern(tpgol: TPGameOfLife, pattern: str) -> None:
+    """Set up tpgol with a pattern named like those in PATTERNS."""
+    kind, parameter = pattern.split('-')
+    if kind == 'level':
+        load_level(tpgol, LevelIndex().level(int(parameter)))
+    elif kind == 'soup':
+        random_soup(tpgol, float(parameter))
+    else:
+        raise ValueError('Unknown pattern: ' + repr(pattern))
+
+
+def time_ticks(tpgol: TPGameOfLife, min_seconds: float = 0.2,
+               max_generations: int = 1000) -> float:
+    """Return the average time of a tick in seconds, ticking for at least
+    min_seconds (and at least once).
+    """
+    generations = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while generations < max_generations and (not generations or
+                                             elapsed < min_seconds):
+        tpgol.tick()
+        generations += 1
+        elapsed = time.perf_counter() - start
+    return elapsed / generations
+
+
+def memory_per_cell(engine: str, columns: int, rows: int) -> float:
+    """Return the number of bytes allocated per cell when creating a
+    TPGameOfLife of the given size with the given engine.
+    """
+    TPGameOfLife(1, 1, engine).close()  # Import what the engine needs first
+    tracemalloc.start()
+    try:
+        tpgol = TPGameOfLife(columns, rows, engine)
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    tpgol.close()
+    return size / (columns*rows)
+
+
+def bench_memory(engines: List[str],
+                 sizes: List[Tuple[int, int]]) -> List[Dict[str, object]]:
+    """Measure the memory used per cell by each engine, for each size."""
+    results = []
+    for columns, rows in sizes:
+        for engine in engines:
+            results.append(result('memory', engine, columns, rows, 'empty',
+                                  memory_per_cell(engine, columns, rows),
+                                  'bytes/cell'))
+    return results
+
+
+def bench_sparse(engines: List[str], sizes: List[Tuple[int, int]],
+                 generations: int = 10) -> List[Dict[str, object]]:
+    """Measure the time per tick, and the cells evaluated per tick where the
+    engine reports it, for a board of gliders that is mostly dead space.
+    """
+    results = []
+    for columns, rows in sizes:
+        for engine in engines:
+            tpgol = TPGameOfLife(columns, rows, engine, seed=0)
+            glider_field(tpgol)
+            evaluated = 0
+            start = time.perf_counter()
+            for generation in range(generations):
+                tpgol.tick()
+                evaluated += getattr(tpgol.engine, 'evaluated',
+                                     columns*rows)
+            elapsed = time.perf_counter() - start
+            tpgol.close()
+            results.append(result('sparse', engine, columns, rows, 'gliders',
+                                  1000 * elapsed / generations, 'ms/tick',
+                                  evaluated=evaluated // generations))
+    return results
+
+
+def bench_scaling(sizes: List[Tuple[int, int]], max_workers: int,
+                  generations: int = 5) -> List[Dict[str, object]]:
+    """Measure the time per tick of the parallel engine on a random soup,
+    for 1 to max_workers workers.
+    """
+    results = []
+    for columns, rows in sizes:
+        for workers in range(1, max_workers+1):
+            tpgol = TPGameOfLife(columns, rows, 'parallel', seed=0,
+                                 workers=workers)
+            random_soup(tpgol)
+            tpgol.tick()  # Warm up the workers
+            start = time.perf_counter()
+            tpgol.advance(generations)
+            elapsed = time.perf_counter() - start
+            tpgol.close()
+            results.append(result('scaling', 'parallel', columns, rows,
+                                  '{}-workers'.format(workers),
+                                  1000 * elapsed / generations, 'ms/tick'))
+    return results
+
+
+def bench_tick(engines: List[str], sizes: List[Tuple[int, int]],
+               patterns: List[str]) -> List[Dict[str, object]]:
+    """Measure the time per tick of each engine, for each size and pattern.
+
+    Sizes are measured from smallest to largest, and an engine skips the
+    remaining sizes once a tick takes longer than MAX_TICK_SECONDS.
+    """
+    results = []
+    for engine in engines:
+        for columns, rows in sorted(sizes, key=lambda size: size[0]*size[1]):
+            slowest = 0.0
+            for pattern in patterns:
+                tpgol = TPGameOfLife(columns, rows, engine, seed=0)
+                apply_pattern(tpgol, pattern)
+                seconds = time_ticks(tpgol)
+                tpgol.close()
+                slowest = max(slowest, seconds)
+                results.append(result('tick', engine, columns, rows, pattern,
+                                      1000 * seconds, 'ms/tick'))
+            if slowest > MAX_TICK_SECONDS:
+                break
+    return results
+
+
+def bench_render(engines: List[str], sizes: List[Tuple[int, int]],
+                 frames: int = 100) -> List[Dict[str, object]]:
+    """Measure the time to draw a frame of the game, using a dummy video
+    driver: the first frame, a frame where nothing changed, a frame after
+    a tick, and drawing the status bar text.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import golg
+    from golg import BoardRenderer, Graphics
+
+    gr = Graphics((1021, 821))
+    font = gr.font('Arial', 20)
+    results = []
+    for columns, rows in sizes:
+        for engine in engines:
+            tpgol = TPGameOfLife(columns, rows, engine, seed=0)
+            apply_pattern(tpgol, 'soup-0.3')
+            gr.draw_grid()
+            renderer = BoardRenderer(gr, tpgol)
+
+            start = time.perf_counter()
+            golg.pygame.display.update(renderer.draw())
+            first = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for frame in range(frames):
+                golg.pygame.display.update(renderer.draw())
+            idle = (time.perf_counter() - start) / frames
+
+            ticks = min(frames, 10)
+            ticked = 0.0
+            for frame in range(ticks):
+                tpgol.tick()
+                start = time.perf_counter()
+                golg.pygame.display.update(renderer.draw())
+                ticked += time.perf_counter() - start
+            ticked /= ticks
+
+            start = time.perf_counter()
+            for frame in range(frames):
+                gr.draw_text(font, 'Generation: ' + str(frame % 10), gr.WHITE,
+                             (3, 3), (20, 20))
+            text = (time.perf_counter() - start) / frames
+            tpgol.close()
+
+            for pattern, seconds in (('first', first), ('idle', idle),
+                                     ('tick', ticked), ('text', text)):
+                results.append(result('render', engine, columns, rows,
+                                      pattern, 1000 * seconds, 'ms/frame'))
+    return results
+
+
+def bench_suite(engines: List[str], sizes: List[Tuple[int, int]],
+                max_workers: int) -> List[Dict[str, object]]:
+    """Run every benchmark."""
+    results = bench_tick(engines, sizes, PATTERNS)
+    results += bench_memory(engines, [(51, 39), (1024, 1024)])
+    results += bench_render(['python'], [(51, 39)])
+    results += bench_sparse(engines, [(1024, 1024)])
+    results += bench_scaling([(256, 256)], max_workers)
+    return results
+
+
+def metadata() -> Dict[str, object]:
+    """Return information about the machine and commit benchmarked."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'],
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL,
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                universal_newlines=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'commit': commit, 'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': multiprocessing.cpu_count(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def key(record: Dict[str, object]) -> Tuple[str, ...]:
+    """Return what identifies a result across runs."""
+    return (record['benchmark'], record['engine'], record['size'],
+            record['pattern'])
+
+
+def compare(old_path: str, new_path: str, threshold: float) -> bool:
+    """Print how the results in new_path differ from those in old_path and
+    return whether none of them got worse by more than threshold (as a
+    fraction of the old value).
+    """
+    with open(old_path) as old_file, open(new_path) as new_file:
+        old = {key(record): record for record in
+               json.load(old_file)['results']}
+        new = json.load(new_file)['results']
+
+    passed = True
+    for record in new:
+        before = old.get(key(record))
+        if before is None or not before['value']:
+            continue
+        change = record['value'] / before['value'] - 1
+        regression = change > threshold
+        passed = passed and not regression
+        print('{:>8} {:>12} {:>11} {:>10} {:12.4f} -> {:12.4f} {} {:+7.1%}{}'
+              .format(record['benchmark'], record['engine'], record['size'],
+                      record['pattern'], before['value'], record['value'],
+                      record['unit'], change,
+                      '  REGRESSION' if regression else ''))
+    return passed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('benchmark', choices=['memory', 'sparse', 'scaling',
+                                              'tick', 'render', 'suite',
+                                              'compare'])
+    parser.add_argument('files', nargs='*',
+                        help='for compare: the old and new results files')
+    parser.add_argument('--size', action='append', type=parse_size,
+                        help='board size as COLUMNSxROWS (repeatable)')
+    parser.add_argument('--engine', action='append', choices=list(ENGINES),
+                        help='engine to measure (repeatable, default all)')
+    parser.add_argument('--pattern', action='append', choices=PATTERNS,
+                        help='pattern for tick (repeatable, default all)')
+    parser.add_argument('--workers', type=int,
+                        default=multiprocessing.cpu_count(),
+                        help='maximum number of workers for scaling')
+    parser.add_argument('--output', help='save the results to this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='for compare: the slowdown, as a fraction, '
+                             'that counts as a regression')
+    args = parser.parse_args()
+
+    if args.benchmark == 'compare':
+        if len(args.files) != 2:
+            parser.error('compare needs an old and a new results file')
+        sys.exit(0 if compare(args.files[0], args.files[1], args.threshold)
+                 else 1)
+
+    engines = args.engine or list(ENGINES)
+    if args.benchmark == 'memory':
+        results = bench_memory(engines, args.size or [(51, 39), (2000, 2000)])
+    elif args.benchmark == 'sparse':
+        results = bench_sparse(engines, args.size or [(500, 500)])
+    elif args.benchmark == 'scaling':
+        results = bench_scaling(args.size or [(512, 512)], args.workers)
+    elif args.benchmark == 'tick':
+        results = bench_tick(engines, args.size or TICK_SIZES,
+                             args.pattern or PATTERNS)
+    elif args.benchmark == 'render':
+        results = bench_render(engines, args.size or [(51, 39)])
+    else:
+        results = bench_suite(engines, args.size or TICK_SIZES, args.workers)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'meta': metadata(), 'results': results}, output,
+                      indent=1)
+
+
+if __name__ == '__main__':
+    main()
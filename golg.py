@@ -1,24 +1,39 @@
 from abc import ABC, abstractmethod
+import array
+import bisect
+import itertools
+import json
+import mmap
+import os
 import time
 import random
+import re
+import shutil
+import struct
 import sys
-from typing import List, Tuple
+from collections import OrderedDict, deque
+import threading
+from typing import Dict, List, NamedTuple, Tuple
+import weakref
 
-import pygame
-pygame.init()
+np = None  # numpy, imported by the first NumpyEngine
 
 
-class Cell:
-    """A cell within a grid in a TPGameOfLife"""
+class _LazyPygame:
+    """A stand-in for the pygame module that imports and initialises pygame
+    the first time it is used, so that the simulation can be used without
+    loading SDL or needing a display.
+    """
 
-    def __init__(self, state: int) -> None:
-        """Create Cell object.
+    def __getattr__(self, name: str):
+        global pygame
+        import pygame as module
+        module.init()
+        pygame = module
+        return getattr(module, name)
 
-        state           The state of the Cell (dead=0/red=1/green=2)
-        next_state      The state of the Cell in the next generation
-        """
-        self.state = state
-        self.next_state = self.state
+
+pygame = _LazyPygame()
 
 
 class TPGameOfLife:
@@ -27,95 +42,2768 @@ class TPGameOfLife:
     DEAD = 0
     RED = 1
     GREEN = 2
-
-    def __init__(self, columns: int, rows: int) -> None:
+    # Further colours, of rules with more than two (see RULES)
+    BLUE = 3
+    YELLOW = 4
+    # The characters of print, by state, with '?' for any state beyond
+    CHARACTERS = '-RGBY'
+    _CHARS = bytes.maketrans(bytes(range(256)),
+                             CHARACTERS.encode().ljust(256, b'?'))
+
+    def __init__(self, columns: int, rows: int, engine: str = 'python',
+                 seed: int = None, rule='p2life', **options) -> None:
         """Create TPGameOfLife object.
 
-        grid        A finite grid representing the Life universe
         columns     The number of columns in the grid (max x)
         rows        The number of rows in the grid (max y)
+        engine      The Engine that stores and updates the grid, by name
+                    (see ENGINES)
+        seed        Seed for the coin flips that decide 3-red/3-green births;
+                    None draws a fresh one, kept as engine.seed
+        rule        The Rule the cells follow, or its name (see RULES)
+        options     Further arguments for the Engine, such as the topology
+                    of a SparseEngine
         """
-        self.grid = [[Cell(self.DEAD) for row in range(rows)] for column in
-                    range(columns)]
+        if engine not in ENGINES:
+            raise ValueError('Unknown engine: ' + repr(engine))
+        if isinstance(rule, str):
+            if rule not in RULES:
+                raise ValueError('Unknown rule: ' + repr(rule))
+            rule = RULES[rule]
         self.columns = columns
         self.rows = rows
+        self.rule = rule
+        self.engine_name = engine
+        self.options = options
+        self.engine = ENGINES[engine](columns, rows, seed, rule, **options)
+
+    def get_state(self, x: int, y: int) -> int:
+        """Return the state of the cell at (x, y)."""
+        return self.engine.get_state(x, y)
+
+    def set_state(self, x: int, y: int, state: int) -> None:
+        """Set the state of the cell at (x, y)."""
+        self.engine.set_state(x, y, state)
+
+    def clear(self) -> None:
+        """Kill every cell on grid."""
+        self.engine.clear()
+
+    def states(self) -> bytes:
+        """Return the states of all cells, column by column."""
+        return self.engine.states()
+
+    def set_states(self, states: bytes) -> None:
+        """Set the states of all cells, column by column, as returned by
+        states.
+        """
+        self.engine.set_states(states)
+
+    def population(self, state: int) -> int:
+        """Return the number of cells with the given state."""
+        return self.engine.population(state)
+
+    def viewport(self, x: int, y: int, columns: int, rows: int) -> bytes:
+        """Return the states of the cells in the window of the given size
+        whose bottom left cell is (x, y), column by column.
+        """
+        return self.engine.viewport(x, y, columns, rows)
+
+    def contains(self, x: int, y: int) -> bool:
+        """Return whether (x, y) is a cell of the universe."""
+        return self.engine.contains(x, y)
 
     def modify_cells(self, state: int, coordinates: List[Tuple[int]]) -> None:
         """Set state of multiple Cells on grid."""
         for coord in coordinates:
-            self.grid[coord[0]][coord[1]].state = state
-            
+            self.engine.set_state(coord[0], coord[1], state)
+
+    def reseed(self, seed: int) -> None:
+        """Restart the coin flips from seed, as if the engine had just been
+        created with it.
+        """
+        self.engine.reseed(seed)
+
     def tick(self) -> None:
         """Move forward one generation."""
-        for x in range(self.columns):
-            for y in range(self.rows):  # Loop over every Cell
-                cell = self.grid[x][y]
-                red_neighbours = 0
-                green_neighbours = 0
-
-                for n_x in range(x-1, x+2):
-                    for n_y in range(y-1, y+2):  # Loop over all neighbours
-                        if (not(n_x == x and n_y == y) and
-                            0 <= n_x < self.columns and
-                            0 <= n_y < self.rows):
-                                # If neighbour is not the Cell itself and
-                                # if neighbour is within grid
-                            if self.grid[n_x][n_y].state == self.RED:
-                                red_neighbours += 1
-                            elif self.grid[n_x][n_y].state == self.GREEN:
-                                green_neighbours += 1
-
-                if cell.state == self.DEAD:  #Birth
-                    if red_neighbours == 3 and green_neighbours == 3:
-                        if random.randint(1, 2) == 1:
-                            cell.next_state = self.RED
-                        else:
-                            cell.next_state = self.GREEN
-                    elif red_neighbours == 3 and green_neighbours != 3:
-                        cell.next_state = self.RED
-                    elif green_neighbours == 3 and red_neighbours != 3:
-                        cell.next_state = self.GREEN
-                elif cell.state == self.RED:  # Red survival/death
-                    if 2 <= red_neighbours - green_neighbours <= 3:
-                        cell.next_state = self.RED
-                    elif (red_neighbours - green_neighbours == 1 and
-                          red_neighbours >= 2):
-                        cell.next_state = self.RED
-                    else:
-                        cell.next_state = self.DEAD
-                elif cell.state == self.GREEN: # Green survival/death
-                    if 2 <= green_neighbours - red_neighbours <= 3:
-                        cell.next_state = self.GREEN
-                    elif (green_neighbours - red_neighbours == 1 and
-                          green_neighbours >= 2):
-                        cell.next_state = self.GREEN
-                    else:
-                        cell.next_state = self.DEAD
+        self.engine.tick()
 
-        # Apply changes to all Cells on grid to move forward a generation
-        for x in range(self.columns):
-            for y in range(self.rows):
-                self.grid[x][y].state = self.grid[x][y].next_state
+    def advance(self, generations: int) -> None:
+        """Move forward multiple generations."""
+        self.engine.advance(generations)
+
+    def close(self) -> None:
+        """Free any resources held by the engine."""
+        self.engine.close()
 
     def print(self) -> None:
         """Print grid in ASCII."""
-        for y in reversed(range(self.rows)):
-            for x in range(self.columns):
-                if self.grid[x][y].state == self.RED:
-                    print('R', end='')
-                elif self.grid[x][y].state == self.GREEN:
-                    print('G', end='')
+        states = self.states()
+        # Row y of the grid is every rows-th state from y
+        print('\n'.join(states[y::self.rows].translate(self._CHARS).decode()
+                        for y in reversed(range(self.rows))))
+
+    def start(self, rate: float = 2.0, viewport: Tuple[int, int] = (0, 0),
+              stream=None) -> None:
+        """Start running the Game of Life in the terminal, until the grid
+        repeats itself.
+
+        rate        Generations per second, or None for as fast as possible
+        viewport    The cell at the bottom left of the terminal, for grids
+                    larger than it
+        stream      The binary stream to draw to, and to report the still
+                    life or cycle on at the end (default standard output)
+
+        The board is drawn by a TerminalRenderer, cut down to the size of
+        the terminal. A generation is not drawn when the next one is
+        already due, or until twice the time the last frame took has
+        passed, as when the terminal is slow to take frames, but at least
+        one frame is drawn every second.
+        """
+        size = shutil.get_terminal_size()
+        columns = min(self.columns, size.columns)
+        rows = min(self.rows, size.lines - 1)  # Leaving a status line
+        renderer = TerminalRenderer(columns, rows, stream)
+        detector = CycleDetector(self)
+        interval = 1 / rate if rate else 0.0
+        generation = 0
+        skipped = 0
+        due = next_frame = drawn = time.perf_counter()
+        try:
+            while True:
+                now = time.perf_counter()
+                late = interval and now > due + interval
+                if detector.cycle is not None or (
+                        now >= next_frame and (not late or now - drawn >= 1)):
+                    renderer.draw(
+                        self.viewport(viewport[0], viewport[1], columns,
+                                      rows),
+                        'Generation {}  red {}  green {}  skipped {}'.format(
+                            generation, self.population(self.RED),
+                            self.population(self.GREEN), skipped))
+                    drawn = now
+                    # Leave the terminal at least as long again as the
+                    # frame took, so that slow output costs frames rather
+                    # than generations
+                    next_frame = now + max(1 / renderer.MAX_FPS,
+                                           2 * (time.perf_counter() - now))
                 else:
-                    print('-', end='')
-            print()
+                    skipped += 1
+                if detector.cycle is not None:
+                    break
+                if interval:
+                    due += interval
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    elif delay < -1:
+                        due -= delay  # Give up on catching up
+                self.tick()
+                generation += 1
+                detector.update()
+        finally:
+            renderer.close()
+        # Below the status line, once the cursor and colours are restored
+        start, period = detector.cycle
+        if period == 1:
+            report = 'Still from generation {}\n'.format(start)
+        else:
+            report = 'Cycle of period {} from generation {}\n'.format(
+                period, start)
+        renderer.stream.write(report.encode())
+        renderer.stream.flush()
+
+
+# Multipliers that mix the seed, generation and position of a coin flip into
+# one 64-bit word, and those of the splitmix64 finalizer that scrambles it;
+# shared by coin_flip, Ensemble and _zobrist_key
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+_FLIP_SEED = 0x9E3779B97F4A7C15
+_FLIP_GENERATION = 0xBF58476D1CE4E5B9
+_FLIP_X = 0x94D049BB133111EB
+_FLIP_Y = 0xD6E8FEB86659FD63
+_MIX_1 = 0xBF58476D1CE4E5B9
+_MIX_2 = 0x94D049BB133111EB
+
+
+def _mix64(h: int) -> int:
+    """Return the splitmix64 finalizer of the 64-bit word h."""
+    h = (h ^ (h >> 30))*_MIX_1 & _MASK64
+    h = (h ^ (h >> 27))*_MIX_2 & _MASK64
+    return h ^ (h >> 31)
+
+
+def new_seed() -> int:
+    """Return a fresh coin flip seed, for engines created without one."""
+    return random.getrandbits(63)
+
+
+def coin_flip(seed: int, generation: int, x: int, y: int,
+              choices: Tuple[int, ...] = (TPGameOfLife.RED,
+                                          TPGameOfLife.GREEN)) -> int:
+    """Return the state of a cell whose next state is decided by a coin flip
+    (under p2life, one born with three red and three green neighbours), as
+    a hash of the seed, the generation the cell is born from, and its
+    position.
+
+    Unlike drawing from a random number generator, the result does not
+    depend on the order in which cells are evaluated.
+    """
+    h = _mix64((seed*_FLIP_SEED + generation*_FLIP_GENERATION + x*_FLIP_X
+                + y*_FLIP_Y) & _MASK64)
+    # Of two choices, an odd hash picks the first
+    return choices[len(choices)-1 - h % len(choices)]
+
+
+def p2life(state: int, red_neighbours: int, green_neighbours: int) -> int:
+    """Return the next state of a cell with the given state and numbers of
+    red and green neighbours, or None if it is decided by a coin flip.
+    """
+    DEAD = TPGameOfLife.DEAD
+    RED = TPGameOfLife.RED
+    GREEN = TPGameOfLife.GREEN
+    if state == DEAD:  # Birth
+        if red_neighbours == 3 and green_neighbours == 3:
+            return None
+        elif red_neighbours == 3 and green_neighbours != 3:
+            return RED
+        elif green_neighbours == 3 and red_neighbours != 3:
+            return GREEN
+        return DEAD
+    elif state == RED:  # Red survival/death
+        if 2 <= red_neighbours - green_neighbours <= 3:
+            return RED
+        elif (red_neighbours - green_neighbours == 1 and
+              red_neighbours >= 2):
+            return RED
+        return DEAD
+    elif state == GREEN:  # Green survival/death
+        if 2 <= green_neighbours - red_neighbours <= 3:
+            return GREEN
+        elif (green_neighbours - red_neighbours == 1 and
+              green_neighbours >= 2):
+            return GREEN
+        return DEAD
+    return state
+
+
+class Rule:
+    """A rule for Life with any number of colours, compiled into a table of
+    next states that engines index instead of evaluating the rule.
+
+    A cell's neighbours are summed into a single count, with each colour
+    weighted by a power of nine, so that the count holds the number of
+    neighbours of every colour as its digits in base 9. The table then has
+    one entry per state and count: 3x81 for p2life.
+    """
+
+    def __init__(self, name: str, colours: int, next_state) -> None:
+        """Create Rule object.
+
+        name        The name of the rule
+        colours     The number of live states, which are 1 to colours (0 is
+                    dead)
+        next_state  The rule, as a function of a cell's state and a tuple of
+                    its numbers of neighbours of each colour that returns the
+                    cell's next state, or a tuple of states to choose from
+                    with a coin flip
+        states      The number of states, dead included
+        weights     The amount a neighbour adds to the count, by state
+        ties        The tuples of states that coin flips choose from
+        table       The next state of a cell, indexed by [state][count], or
+                    -1-k for a coin flip between the states of ties[k]
+        """
+        self.name = name
+        self.colours = colours
+        self.next_state = next_state
+        self.states = colours + 1
+        self.weights = (0,) + tuple(9**colour for colour in range(colours))
+        self.ties = []
+        self.table = [[TPGameOfLife.DEAD] * 9**colours
+                      for state in range(self.states)]
+        for counts in itertools.product(range(9), repeat=colours):
+            if sum(counts) > 8:
+                continue  # Not a possible neighbourhood
+            count = sum(n * 9**colour for colour, n in enumerate(counts))
+            for state in range(self.states):
+                result = next_state(state, counts)
+                if isinstance(result, tuple):
+                    if result not in self.ties:
+                        self.ties.append(result)
+                    result = -1 - self.ties.index(result)
+                self.table[state][count] = result
+
+    def __repr__(self) -> str:
+        return 'Rule({!r})'.format(self.name)
+
+
+def _p2life_rule(state: int, counts: Tuple[int, int]) -> int:
+    """p2life as a Rule: a coin flip decides between red and green."""
+    state = p2life(state, *counts)
+    if state is None:
+        return (TPGameOfLife.RED, TPGameOfLife.GREEN)
+    return state
+
+
+def _immigration_rule(state: int, counts: Tuple[int, int]) -> int:
+    """Immigration: Conway's rules, with a cell born in the colour of most of
+    its three neighbours.
+    """
+    red_neighbours, green_neighbours = counts
+    if state == TPGameOfLife.DEAD:
+        if red_neighbours + green_neighbours == 3:
+            if red_neighbours >= 2:
+                return TPGameOfLife.RED
+            return TPGameOfLife.GREEN
+        return TPGameOfLife.DEAD
+    if 2 <= red_neighbours + green_neighbours <= 3:
+        return state
+    return TPGameOfLife.DEAD
+
+
+def _quadlife_rule(state: int, counts: Tuple[int, int, int, int]) -> int:
+    """Quad-Life: Conway's rules with four colours, and a cell born in the
+    colour of most of its three neighbours, or in the fourth colour if they
+    all differ.
+    """
+    if state == TPGameOfLife.DEAD:
+        if sum(counts) == 3:
+            if max(counts) >= 2:
+                return counts.index(max(counts)) + 1
+            return counts.index(0) + 1
+        return TPGameOfLife.DEAD
+    if 2 <= sum(counts) <= 3:
+        return state
+    return TPGameOfLife.DEAD
+
+
+# Rules selectable by name when creating a TPGameOfLife
+RULES = {
+    'p2life': Rule('p2life', 2, _p2life_rule),
+    'immigration': Rule('immigration', 2, _immigration_rule),
+    'quadlife': Rule('quadlife', 4, _quadlife_rule),
+}
+
+
+class Engine(ABC):
+    """The storage and update rule behind the grid of a TPGameOfLife.
+
+    Engines all follow the table of a Rule (p2life by default) and differ
+    only in how the grid is held in memory and how a generation is
+    computed.
+    """
+
+    def __init__(self, columns: int, rows: int, seed: int = None,
+                 rule: Rule = None) -> None:
+        """Create Engine object.
 
-    def start(self) -> None:
-        """Start running the Game of Life via print method."""
-        while True:
-            print()
-            self.print()
+        columns     The number of columns in the grid (max x)
+        rows        The number of rows in the grid (max y)
+        seed        Seed for the coin flips that decide 3-red/3-green births;
+                    None draws a fresh one with new_seed
+        rule        The Rule the cells follow (default p2life)
+        flips       The number of coin flips in the last tick or advance
+        """
+        rule = rule or RULES['p2life']
+        if self.max_colours is not None and rule.colours > self.max_colours:
+            raise ValueError('{} supports rules of up to {} colours'.format(
+                type(self).__name__, self.max_colours))
+        self.columns = columns
+        self.rows = rows
+        self.seed = new_seed() if seed is None else seed
+        self.rule = rule
+        self.flips = 0
+
+    # Whether the universe ends at the edges of the grid
+    bounded = True
+    # The most colours of a Rule the engine can follow, if limited
+    max_colours = None
+
+    @abstractmethod
+    def get_state(self, x: int, y: int) -> int:
+        """Return the state of the cell at (x, y)."""
+        pass
+
+    @abstractmethod
+    def set_state(self, x: int, y: int, state: int) -> None:
+        """Set the state of the cell at (x, y)."""
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Kill every cell on grid."""
+        pass
+
+    def states(self) -> bytes:
+        """Return the states of all cells, column by column."""
+        return bytes(self.get_state(x, y) for x in range(self.columns)
+                     for y in range(self.rows))
+
+    def set_states(self, states: bytes) -> None:
+        """Set the states of all cells, column by column, as returned by
+        states.
+        """
+        for x in range(self.columns):
+            for y in range(self.rows):
+                self.set_state(x, y, states[x*self.rows + y])
+
+    def population(self, state: int) -> int:
+        """Return the number of cells with the given state."""
+        return self.states().count(state)
+
+    def contains(self, x: int, y: int) -> bool:
+        """Return whether (x, y) is a cell of the universe."""
+        return 0 <= x < self.columns and 0 <= y < self.rows
+
+    def viewport(self, x: int, y: int, columns: int, rows: int) -> bytes:
+        """Return the states of the cells in the window of the given size
+        whose bottom left cell is (x, y), column by column.
+        """
+        if (x, y, columns, rows) == (0, 0, self.columns, self.rows):
+            return self.states()
+        # Copy the part of every column that is on the grid into place
+        states = self.states()
+        window = bytearray(columns * rows)
+        y_start = max(0, y)
+        y_end = min(self.rows, y + rows)
+        for column in range(max(0, x), min(self.columns, x + columns)):
+            if y_start < y_end:
+                start = (column-x)*rows + y_start-y
+                window[start:start + y_end-y_start] = states[
+                    column*self.rows + y_start:column*self.rows + y_end]
+        return bytes(window)
+
+    def reseed(self, seed: int) -> None:
+        """Restart the coin flips from seed, as if the engine had just been
+        created with it (None draws a fresh one).
+        """
+        self.seed = new_seed() if seed is None else seed
+
+    def changes(self) -> List[Tuple[int, int, int, int]]:
+        """Return the cells that changed since the last call, as (x, y, old
+        state, new state) tuples, or None if the engine cannot tell.
+
+        Engines that can tell start keeping track on the first call, which
+        returns None, and may stop (returning None again) after clear.
+        """
+        return None
+
+    @abstractmethod
+    def tick(self) -> None:
+        """Move forward one generation."""
+        pass
+
+    def advance(self, generations: int) -> None:
+        """Move forward multiple generations."""
+        flips = 0
+        for generation in range(generations):
             self.tick()
-            time.sleep(0.5)
+            flips += self.flips
+        self.flips = flips
+
+    def close(self) -> None:
+        """Free any resources held outside of the Engine object."""
+        pass
+
+
+class PythonEngine(Engine):
+    """The reference Engine, updated in pure Python.
+
+    The grid is held as two bytearrays of cell states, one byte per cell,
+    with a border of dead cells around the edge so that neighbour lookups
+    never need bounds checks. Each generation is written into the spare
+    buffer and the two are then swapped.
+    """
+
+    def __init__(self, columns: int, rows: int, seed: int = None,
+                 rule: Rule = None) -> None:
+        """Create PythonEngine object.
+
+        cells       The current generation, column by column
+        stride      The distance between horizontally adjacent cells in cells
+        random      The random number generator used for coin flips
+        """
+        super().__init__(columns, rows, seed, rule)
+        self.stride = rows + 2
+        self.cells = bytearray((columns+2) * self.stride)
+        self._next_cells = bytearray(len(self.cells))
+        self.random = random.Random(self.seed)
+
+    def _index(self, x: int, y: int) -> int:
+        """Return the position of the cell at (x, y) in cells."""
+        return (x+1)*self.stride + y + 1
+
+    def get_state(self, x: int, y: int) -> int:
+        return self.cells[self._index(x, y)]
+
+    def set_state(self, x: int, y: int, state: int) -> None:
+        self.cells[self._index(x, y)] = state
+
+    def clear(self) -> None:
+        self.cells[:] = bytes(len(self.cells))
+
+    def states(self) -> bytes:
+        cells = self.cells
+        start = self._index(0, 0)
+        return b''.join(cells[i:i+self.rows] for i in
+                        range(start, start + self.columns*self.stride,
+                              self.stride))
+
+    def set_states(self, states: bytes) -> None:
+        rows = self.rows
+        for x in range(self.columns):
+            start = self._index(x, 0)
+            self.cells[start:start+rows] = states[x*rows:(x+1)*rows]
+
+    def reseed(self, seed: int) -> None:
+        super().reseed(seed)
+        self.random = random.Random(self.seed)
+
+    def population(self, state: int) -> int:
+        # The border is always dead and must not be counted
+        if state == TPGameOfLife.DEAD:
+            return (self.columns*self.rows - len(self.cells)
+                    + self.cells.count(state))
+        return self.cells.count(state)
+
+    def _next_state(self, cells: bytearray, i: int,
+                    offsets: Tuple[int, ...]) -> int:
+        """Return the state that the cell at position i in cells will have in
+        the next generation.
+        """
+        weights = self.rule.weights
+        count = 0
+        for offset in offsets:  # Loop over all neighbours
+            count += weights[cells[i+offset]]
+
+        state = self.rule.table[cells[i]][count]
+        if state < 0:
+            self.flips += 1
+            choices = self.rule.ties[-1 - state]
+            state = choices[self.random.randint(1, len(choices)) - 1]
+        return state
+
+    def _offsets(self) -> Tuple[int, ...]:
+        """Return the positions of the eight neighbours of a cell in cells,
+        relative to the cell.
+        """
+        stride = self.stride
+        return (-stride-1, -stride, -stride+1, -1, 1, stride-1, stride,
+                stride+1)
+
+    def tick(self) -> None:
+        cells = self.cells
+        next_cells = self._next_cells
+        next_state = self._next_state
+        offsets = self._offsets()
+        self.flips = 0
+
+        for x in range(self.columns):
+            start = (x+1)*self.stride + 1
+            for i in range(start, start+self.rows):  # Loop over every cell
+                next_cells[i] = next_state(cells, i, offsets)
+
+        # The new generation becomes current; the old one is overwritten next
+        self.cells, self._next_cells = next_cells, cells
+
+
+class IncrementalEngine(PythonEngine):
+    """A PythonEngine that only evaluates cells that can possibly change.
+
+    A cell can only change if it or one of its neighbours changed in the
+    previous generation, so the cells that changed (or were set through
+    set_state) are remembered and only their neighbourhoods are evaluated
+    in the next tick. The cost of a tick therefore scales with the
+    activity on the board, not its area.
+
+    That does not hold for rules with coin flips that can leave a cell as
+    it is, as the cell may then change later without anything around it
+    changing, nor for rules under which a dead cell with no live
+    neighbours comes to life, as such cells are never evaluated. Those
+    rules are refused.
+    """
+
+    def __init__(self, columns: int, rows: int, seed: int = None,
+                 rule: Rule = None) -> None:
+        """Create IncrementalEngine object.
+
+        active      Positions in cells that changed since the last tick
+        evaluated   The number of cells evaluated in the last tick
+        """
+        super().__init__(columns, rows, seed, rule)
+        for state, results in enumerate(self.rule.table):
+            if any(result < 0 and state in self.rule.ties[-1 - result]
+                   for result in results):
+                raise ValueError('IncrementalEngine cannot follow rules '
+                                 'whose coin flips can leave a cell as it '
+                                 'is')
+        if self.rule.table[TPGameOfLife.DEAD][0] != TPGameOfLife.DEAD:
+            raise ValueError('IncrementalEngine cannot follow rules under '
+                             'which isolated dead cells come to life')
+        self.active = set()
+        self.evaluated = 0
+        # The old state of every position in cells changed since the last
+        # call to changes, or None if nobody is keeping track
+        self._journal = None
+        # Whether each position in cells is on the grid, not the border
+        self._interior = bytearray(len(self.cells))
+        for x in range(columns):
+            start = self._index(x, 0)
+            self._interior[start:start+rows] = b'\x01' * rows
+
+    def set_state(self, x: int, y: int, state: int) -> None:
+        i = self._index(x, y)
+        if self._journal is not None:
+            self._journal.setdefault(i, self.cells[i])
+        super().set_state(x, y, state)
+        self.active.add(i)
+
+    def clear(self) -> None:
+        super().clear()
+        self.active = set()
+        self._journal = None
+
+    def changes(self) -> List[Tuple[int, int, int, int]]:
+        journal = self._journal
+        self._journal = {}
+        if journal is None:
+            return None
+        cells = self.cells
+        stride = self.stride
+        return [(i // stride - 1, i % stride - 1, old, cells[i])
+                for i, old in journal.items()]
+
+    def set_states(self, states: bytes) -> None:
+        cells = self.cells
+        rows = self.rows
+        for x in range(self.columns):
+            start = self._index(x, 0)
+            column = states[x*rows:(x+1)*rows]
+            if cells[start:start+rows] != column:
+                changed = [start+y for y in range(rows)
+                           if cells[start+y] != column[y]]
+                if self._journal is not None:
+                    for i in changed:
+                        self._journal.setdefault(i, cells[i])
+                self.active.update(changed)
+                cells[start:start+rows] = column
+
+    def tick(self) -> None:
+        cells = self.cells
+        interior = self._interior
+        next_state = self._next_state
+        offsets = self._offsets()
+        self.flips = 0
+
+        candidates = set()
+        for i in self.active:
+            candidates.add(i)
+            for offset in offsets:
+                candidates.add(i+offset)
+        # Sorted, so that cells are evaluated (and coins are flipped) in the
+        # same order as in PythonEngine
+        candidates = [i for i in sorted(candidates) if interior[i]]
+
+        changes = []
+        for i in candidates:
+            state = next_state(cells, i, offsets)
+            if state != cells[i]:
+                changes.append((i, state))
+        journal = self._journal
+        for i, state in changes:
+            if journal is not None:
+                journal.setdefault(i, cells[i])
+            cells[i] = state
+
+        self.active = set(i for i, state in changes)
+        self.evaluated = len(candidates)
+
+
+# The two grid buffers of a ParallelEngine, as seen by its worker processes
+_worker_buffers = []
+# The weights, table and ties of the Rule of a ParallelEngine, likewise
+_worker_rule = []
+
+
+def _init_worker(buffers: List['shared_memory.SharedMemory'],
+                 rule: Tuple[tuple, list, list]) -> None:
+    """Keep the shared grid buffers and the compiled Rule of a
+    ParallelEngine in a worker.
+    """
+    _worker_buffers[:] = buffers
+    _worker_rule[:] = rule
+
+
+def _tick_tile(task: Tuple[int, ...]) -> int:
+    """Compute the next generation of the columns x_start to x_end - 1 of a
+    ParallelEngine grid, in a worker process, and return the number of coins
+    flipped.
+    """
+    current, columns, rows, x_start, x_end, seed, generation = task
+    weights, table, ties = _worker_rule
+    cells = _worker_buffers[current].buf
+    next_cells = _worker_buffers[1-current].buf
+    stride = rows + 2
+    offsets = (-stride-1, -stride, -stride+1, -1, 1, stride-1, stride,
+               stride+1)
+    flips = 0
+
+    for x in range(x_start, x_end):
+        start = (x+1)*stride + 1
+        for y in range(rows):
+            i = start + y
+            count = 0
+            for offset in offsets:
+                count += weights[cells[i+offset]]
+            state = table[cells[i]][count]
+            if state < 0:
+                state = coin_flip(seed, generation, x, y, ties[-1 - state])
+                flips += 1
+            next_cells[i] = state
+    return flips
+
+
+class ParallelEngine(Engine):
+    """An Engine that splits the grid into tiles of whole columns and
+    computes each tile in a separate process.
+
+    The grid is laid out like in PythonEngine, but its two buffers live in
+    shared memory, so workers read their tile and its one-cell halo straight
+    from the current generation and write into the next one. Nothing but
+    the tile bounds is sent to the workers each tick.
+
+    Coin flips use coin_flip, so results do not depend on the number of
+    workers or tiles.
+    """
+
+    def __init__(self, columns: int, rows: int, seed: int = None,
+                 rule: Rule = None, workers: int = None,
+                 tiles: int = None) -> None:
+        """Create ParallelEngine object.
+
+        workers     The number of worker processes (default: one per CPU)
+        tiles       The number of tiles the grid is split into each tick
+                    (default: one per worker)
+        generation  The number of generations advanced so far
+        """
+        # Imported here, as multiprocessing is slow to import
+        import multiprocessing
+        from multiprocessing import shared_memory
+        super().__init__(columns, rows, seed, rule)
+        self.workers = workers or multiprocessing.cpu_count()
+        self.tiles = min(tiles or self.workers, columns) or 1
+        self.generation = 0
+        self.stride = rows + 2
+        size = (columns+2) * self.stride
+        self._buffers = [shared_memory.SharedMemory(create=True, size=size)
+                         for buffer in range(2)]
+        for buffer in self._buffers:
+            buffer.buf[:size] = bytes(size)
+        self._size = size
+        self._current = 0
+        self._pool = multiprocessing.Pool(
+            self.workers, _init_worker,
+            (self._buffers, (self.rule.weights, self.rule.table,
+                             self.rule.ties)))
+        self._finalizer = weakref.finalize(self, self._release, self._pool,
+                                           self._buffers)
+
+    @staticmethod
+    def _release(pool: 'multiprocessing.pool.Pool',
+                 buffers: List['shared_memory.SharedMemory']) -> None:
+        """Stop the workers and free the shared memory."""
+        pool.close()
+        pool.join()
+        for buffer in buffers:
+            buffer.close()
+            buffer.unlink()
+
+    def close(self) -> None:
+        self._finalizer()
+
+    @property
+    def cells(self) -> memoryview:
+        """The current generation, column by column."""
+        return self._buffers[self._current].buf
+
+    def get_state(self, x: int, y: int) -> int:
+        return self.cells[(x+1)*self.stride + y + 1]
+
+    def set_state(self, x: int, y: int, state: int) -> None:
+        self.cells[(x+1)*self.stride + y + 1] = state
+
+    def clear(self) -> None:
+        self.cells[:self._size] = bytes(self._size)
+
+    def states(self) -> bytes:
+        cells = self.cells
+        start = self.stride + 1
+        return b''.join(cells[i:i+self.rows] for i in
+                        range(start, start + self.columns*self.stride,
+                              self.stride))
+
+    def set_states(self, states: bytes) -> None:
+        cells = self.cells
+        rows = self.rows
+        for x in range(self.columns):
+            start = (x+1)*self.stride + 1
+            cells[start:start+rows] = states[x*rows:(x+1)*rows]
+
+    def reseed(self, seed: int) -> None:
+        super().reseed(seed)
+        self.generation = 0
+
+    def tick(self) -> None:
+        tasks = []
+        for tile in range(self.tiles):
+            tasks.append((self._current, self.columns, self.rows,
+                          tile*self.columns // self.tiles,
+                          (tile+1)*self.columns // self.tiles,
+                          self.seed, self.generation))
+        self.flips = sum(self._pool.map(_tick_tile, tasks))
+        self._current = 1 - self._current
+        self.generation += 1
+
+
+class BitplaneEngine(Engine):
+    """An Engine that packs the grid into two bitplanes, one for red cells
+    and one for green cells, each held as a single Python integer.
+
+    Cell (x, y) is bit x*stride + y of each plane, with one always-dead
+    guard bit between columns, so a whole generation is computed with a
+    few dozen bitwise operations over entire planes. Neighbour counts are
+    summed with full adders into four bit-sliced count planes, and the
+    entries of the Rule's table that bring a cell to life are then
+    evaluated as masks over those counts.
+
+    Coin flips are drawn in the same order as PythonEngine, so for the same
+    seed the two engines produce identical grids.
+    """
+    max_colours = 2
+
+    def __init__(self, columns: int, rows: int, seed: int = None,
+                 rule: Rule = None) -> None:
+        """Create BitplaneEngine object.
+
+        red         Plane with a set bit for every red cell
+        green       Plane with a set bit for every green cell
+        stride      The distance in bits between horizontally adjacent cells
+        random      The random number generator used for coin flips
+        """
+        super().__init__(columns, rows, seed, rule)
+        self.red = 0
+        self.green = 0
+        self.stride = rows + 1
+        self.random = random.Random(self.seed)
+        # Translations of '0'/'1' characters into state bytes, by state
+        self._table = [bytes.maketrans(b'01', bytes((0, state)))
+                       for state in range(3)]
+        # Translations of state bytes into '1' for state and '0' otherwise
+        self._bits = [bytes.maketrans(bytes(range(256)), bytes(
+                      b'1'[0] if byte == state else b'0'[0]
+                      for byte in range(256))) for state in range(3)]
+        # Every bit that represents a cell on the grid
+        column = (1 << rows) - 1
+        self._mask = 0
+        for x in range(columns):
+            self._mask |= column << x*self.stride
+        self._terms = self._compile(self.rule)
+        # (red, green) at the last call to changes, or None
+        self._tracked = None
+
+    @staticmethod
+    def _compile(rule: Rule) -> List[Tuple]:
+        """Return the entries of the table of rule that bring a cell to life
+        (or flip a coin) as terms (state, result, by_red, groups): a cell of
+        state gets result if, for one (n, counts, invert) in groups, it has
+        n neighbours of one colour (red if by_red) and any of counts
+        neighbours of the other (or none of them if invert).
+
+        The entries for each state and result are grouped by the count of
+        whichever colour gives the fewest terms, and each group by the
+        shorter of its counts of the other colour and their complement.
+        """
+        pairs = {}  # (state, result) -> {(red, green)}
+        for state in range(3):
+            for red_neighbours in range(9):
+                for green_neighbours in range(9 - red_neighbours):
+                    result = rule.table[state][red_neighbours
+                                               + 9*green_neighbours]
+                    if result != TPGameOfLife.DEAD:
+                        pairs.setdefault((state, result), set()).add(
+                            (red_neighbours, green_neighbours))
+        terms = []
+        for (state, result), cells in pairs.items():
+            options = []
+            for by_red in (True, False):
+                groups = {}
+                for red_neighbours, green_neighbours in cells:
+                    n, other = ((red_neighbours, green_neighbours) if by_red
+                                else (green_neighbours, red_neighbours))
+                    groups.setdefault(n, set()).add(other)
+                option = []
+                for n, others in sorted(groups.items()):
+                    complement = set(range(9 - n)) - others
+                    invert = len(complement) < len(others)
+                    counts = tuple(sorted(complement if invert else others))
+                    option.append((n, counts, invert))
+                options.append((state, result, by_red, option))
+            terms.append(min(options, key=lambda term: sum(
+                2 + len(counts) for n, counts, invert in term[3])))
+        return terms
+
+    def get_state(self, x: int, y: int) -> int:
+        bit = 1 << x*self.stride + y
+        if self.red & bit:
+            return TPGameOfLife.RED
+        elif self.green & bit:
+            return TPGameOfLife.GREEN
+        return TPGameOfLife.DEAD
+
+    def set_state(self, x: int, y: int, state: int) -> None:
+        bit = 1 << x*self.stride + y
+        self.red &= ~bit
+        self.green &= ~bit
+        if state == TPGameOfLife.RED:
+            self.red |= bit
+        elif state == TPGameOfLife.GREEN:
+            self.green |= bit
+
+    def clear(self) -> None:
+        self.red = 0
+        self.green = 0
+
+    def _bytes(self, plane: int, state: int) -> int:
+        """Return plane with every bit widened to a byte holding state."""
+        size = self.columns * self.stride
+        # Bits from the lowest up, as a string of '0's and '1's
+        bits = bin(plane | 1 << size)[:2:-1]
+        return int.from_bytes(bits.encode().translate(self._table[state]),
+                              'little')
+
+    def states(self) -> bytes:
+        size = self.columns * self.stride
+        cells = (self._bytes(self.red, TPGameOfLife.RED)
+                 + self._bytes(self.green, TPGameOfLife.GREEN))
+        cells = cells.to_bytes(size, 'little')
+        return b''.join(cells[i:i+self.rows] for i in
+                        range(0, size, self.stride))
+
+    def set_states(self, states: bytes) -> None:
+        rows = self.rows
+        # Every column followed by its guard bit, as one byte per bit
+        cells = b'\x00'.join(states[i:i+rows] for i in
+                              range(0, self.columns*rows, rows)) + b'\x00'
+        # Bits from the highest down, as a string of '0's and '1's
+        self.red = int(cells.translate(self._bits[TPGameOfLife.RED])[::-1]
+                       or b'0', 2)
+        self.green = int(cells.translate(self._bits[TPGameOfLife.GREEN])
+                         [::-1] or b'0', 2)
+
+    def reseed(self, seed: int) -> None:
+        super().reseed(seed)
+        self.random = random.Random(self.seed)
+
+    def population(self, state: int) -> int:
+        if state == TPGameOfLife.RED:
+            return bin(self.red).count('1')
+        elif state == TPGameOfLife.GREEN:
+            return bin(self.green).count('1')
+        return (self.columns*self.rows - bin(self.red).count('1')
+                - bin(self.green).count('1'))
+
+    def _count(self, plane: int) -> List[int]:
+        """Return masks of the cells that have exactly 0 to 8 live
+        neighbours in plane, indexed by the number of neighbours.
+        """
+        mask = self._mask
+        stride = self.stride
+        # The eight neighbours of every cell, as shifted planes
+        a, b = plane << 1, plane >> 1
+        c, d = plane << stride, plane >> stride
+        e, f = plane << stride+1, plane >> stride+1
+        g, h = plane << stride-1, plane >> stride-1
+
+        # Add them up into the bits of a four bit count, with full adders
+        ab = a ^ b
+        s1, c1 = ab ^ c, (a & b) | (c & ab)
+        de = d ^ e
+        s2, c2 = de ^ f, (d & e) | (f & de)
+        s3, c3 = g ^ h, g & h
+        s12 = s1 ^ s2
+        bit0, c4 = s12 ^ s3, (s1 & s2) | (s3 & s12)
+        c12 = c1 ^ c2
+        t, d1 = c12 ^ c3, (c1 & c2) | (c3 & c12)
+        bit1, d2 = t ^ c4, t & c4
+        bit2, bit3 = d1 ^ d2, d1 & d2
+
+        bits = (bit0 & mask, bit1 & mask, bit2 & mask, bit3 & mask)
+        counts = []
+        for n in range(9):
+            count = mask
+            for i, bit in enumerate(bits):
+                count &= bit if n >> i & 1 else mask ^ bit
+            counts.append(count)
+        return counts
+
+    def changes(self) -> List[Tuple[int, int, int, int]]:
+        tracked = self._tracked
+        self._tracked = (self.red, self.green)
+        if tracked is None:
+            return None
+        # The planes as bytes, so that only the bytes with changed cells
+        # are looked at bit by bit
+        size = (self.columns*self.stride + 7) // 8
+        old_red, old_green, red, green = (plane.to_bytes(size, 'little')
+                                          for plane in tracked + self._tracked)
+        changed = ((tracked[0] ^ self.red) | (tracked[1] ^ self.green)
+                   ).to_bytes(size, 'little')
+        changes = []
+        for match in re.finditer(b'[^\x00]', changed):
+            byte = match.start()
+            bits = changed[byte]
+            while bits:
+                bit = bits & -bits
+                bits ^= bit
+                x, y = divmod(byte*8 + bit.bit_length()-1, self.stride)
+                old = (TPGameOfLife.RED if old_red[byte] & bit else
+                       TPGameOfLife.GREEN if old_green[byte] & bit else
+                       TPGameOfLife.DEAD)
+                new = (TPGameOfLife.RED if red[byte] & bit else
+                       TPGameOfLife.GREEN if green[byte] & bit else
+                       TPGameOfLife.DEAD)
+                changes.append((x, y, old, new))
+        return changes
+
+    def tick(self) -> None:
+        red = self.red
+        green = self.green
+        dead = self._mask ^ (red | green)
+        red_counts = self._count(red)
+        green_counts = self._count(green)
+
+        states = (dead, red, green)
+        planes = [0, 0, 0]  # The next generation, by state
+        ties = [0] * len(self.rule.ties)
+        for state, result, by_red, groups in self._terms:
+            if by_red:
+                first, second = red_counts, green_counts
+            else:
+                first, second = green_counts, red_counts
+            cells = 0
+            for n, counts, invert in groups:
+                others = 0
+                for count in counts:
+                    others |= second[count]
+                if invert:
+                    cells |= first[n] & ~others if others else first[n]
+                else:
+                    cells |= first[n] & others
+            cells &= states[state]
+            if result < 0:
+                ties[-1 - result] |= cells
+            else:
+                planes[result] |= cells
+        self.red = planes[TPGameOfLife.RED]
+        self.green = planes[TPGameOfLife.GREEN]
+
+        self.flips = 0
+        coin_flip = 0
+        for tie in ties:
+            coin_flip |= tie
+        if coin_flip:
+            # Flip coins from the lowest bit up, i.e. column by column. The
+            # outcomes are collected as strings of '0's and '1's and turned
+            # into planes at the end, as setting bits one at a time in a
+            # large plane would copy the plane every time.
+            bits = bin(coin_flip)[:1:-1]
+            size = len(bits)
+            # The bits of each kind of coin flip, likewise
+            groups = [bin(tie | 1 << size)[:2:-1] for tie in ties]
+            flips = [bytearray(b'0' * size) for state in range(3)]
+            self.flips = bits.count('1')
+            i = bits.find('1')
+            while i != -1:
+                for k, group in enumerate(groups):
+                    if group[i] == '1':
+                        choices = self.rule.ties[k]
+                        break
+                state = choices[self.random.randint(1, len(choices)) - 1]
+                flips[state][i] = ord('1')
+                i = bits.find('1', i+1)
+            self.red |= int(flips[TPGameOfLife.RED][::-1], 2)
+            self.green |= int(flips[TPGameOfLife.GREEN][::-1], 2)
+
+
+class Node:
+    """A canonical node of the quadtree in a HashlifeEngine.
+
+    A node at level n is a square of 2^n by 2^n cells, split into four
+    nodes at level n-1. Level 0 nodes are plain cell states (ints).
+    """
+    __slots__ = ('nw', 'ne', 'sw', 'se', 'level', 'red', 'green')
+
+    def __init__(self, nw, ne, sw, se, level: int) -> None:
+        """Create Node object.
+
+        level       The node is 2^level cells wide
+        red         The number of red cells in the node
+        green       The number of green cells in the node
+        """
+        self.nw = nw
+        self.ne = ne
+        self.sw = sw
+        self.se = se
+        self.level = level
+        if level == 1:
+            quadrants = (nw, ne, sw, se)
+            self.red = quadrants.count(TPGameOfLife.RED)
+            self.green = quadrants.count(TPGameOfLife.GREEN)
+        else:
+            self.red = nw.red + ne.red + sw.red + se.red
+            self.green = nw.green + ne.green + sw.green + se.green
+
+
+class HashlifeEngine(Engine):
+    """An Engine that stores the grid as a canonical quadtree and memoizes
+    the future of each node, so that it can advance 2^k generations at once.
+
+    Cells outside the grid are filled with a fourth, permanent WALL state
+    that is nobody's neighbour. The grid's hard edges are then part of the
+    pattern, and the usual Hashlife recursion reproduces the finite grid of
+    the other engines exactly.
+
+    Coin flips use coin_flip, keyed on the absolute position and
+    generation of the birth. Results that involved a coin flip depend on
+    where and when they happened and are therefore not memoized; everything
+    else is. Both the memo cache and the node table are bounded.
+    """
+    WALL = 3
+    max_colours = 2
+
+    def __init__(self, columns: int, rows: int, seed: int = None,
+                 rule: Rule = None, cache_size: int = 1 << 20,
+                 max_nodes: int = 1 << 21) -> None:
+        """Create HashlifeEngine object.
+
+        generation  The number of generations advanced so far
+        cache_size  The maximum number of memoized results (least recently
+                    used are evicted first)
+        max_nodes   The number of nodes at which unreachable nodes are
+                    discarded
+        root        The quadtree node covering the grid
+        origin      The position of the top left cell of root, relative to
+                    the grid
+        """
+        super().__init__(columns, rows, seed, rule)
+        self.generation = 0
+        self.cache_size = cache_size
+        self.max_nodes = max_nodes
+        self._nodes = {}
+        self._cache = OrderedDict()
+        self._walls = [self.WALL]
+        # The weights of the rule, with WALL nobody's neighbour
+        self._weights = self.rule.weights + (0,)
+        self.hits = 0
+        self.misses = 0
+        # (root, origin) at the last call to changes, or None
+        self._tracked = None
+
+        # The grid must fit in the central half of root
+        level = 3
+        while 1 << level-1 < max(columns, rows):
+            level += 1
+        self.origin = -(1 << level-2)
+        self.root = self._build(level, self.origin, self.origin, lambda x, y:
+                                TPGameOfLife.DEAD)
+
+    def _node(self, nw, ne, sw, se):
+        """Return the canonical node with the given quadrants."""
+        key = (nw, ne, sw, se)
+        node = self._nodes.get(key)
+        if node is None:
+            level = 1 if isinstance(nw, int) else nw.level + 1
+            node = self._nodes[key] = Node(nw, ne, sw, se, level)
+        return node
+
+    def _wall(self, level: int):
+        """Return the node at level that is entirely WALL."""
+        while len(self._walls) <= level:
+            wall = self._walls[-1]
+            self._walls.append(self._node(wall, wall, wall, wall))
+        return self._walls[level]
+
+    def _build(self, level: int, x: int, y: int, get_state):
+        """Return the node at level whose top left cell is (x, y), reading
+        cells on the grid with get_state(x, y).
+        """
+        size = 1 << level
+        if x >= self.columns or y >= self.rows or x+size <= 0 or y+size <= 0:
+            return self._wall(level)
+        if level == 0:
+            if 0 <= x and 0 <= y:
+                return get_state(x, y)
+            return self.WALL
+        half = size // 2
+        return self._node(self._build(level-1, x, y, get_state),
+                          self._build(level-1, x+half, y, get_state),
+                          self._build(level-1, x, y+half, get_state),
+                          self._build(level-1, x+half, y+half, get_state))
+
+    def load(self, tpgol: 'TPGameOfLife') -> None:
+        """Replace the grid with the cells of another TPGameOfLife of the
+        same size.
+        """
+        self.root = self._build(self.root.level, self.origin, self.origin,
+                                tpgol.get_state)
+
+    def export(self, tpgol: 'TPGameOfLife') -> None:
+        """Write the grid into another TPGameOfLife of the same size."""
+        tpgol.clear()
+        self._export(self.root, self.origin, self.origin, tpgol.set_state)
+
+    def _export(self, node, x: int, y: int, set_state) -> None:
+        """Call set_state(x, y, state) for every live cell of node, whose
+        top left cell is (x, y).
+        """
+        if not node.red and not node.green:
+            return  # Nothing alive in here
+        if node.level == 1:
+            for state, c_x, c_y in ((node.nw, x, y), (node.ne, x+1, y),
+                                    (node.sw, x, y+1), (node.se, x+1, y+1)):
+                if state == TPGameOfLife.RED or state == TPGameOfLife.GREEN:
+                    set_state(c_x, c_y, state)
+            return
+        half = 1 << node.level-1
+        self._export(node.nw, x, y, set_state)
+        self._export(node.ne, x+half, y, set_state)
+        self._export(node.sw, x, y+half, set_state)
+        self._export(node.se, x+half, y+half, set_state)
+
+    def states(self) -> bytes:
+        # Only the live cells are visited, quadrant by quadrant
+        states = bytearray(self.columns * self.rows)
+        rows = self.rows
+
+        def set_state(x: int, y: int, state: int) -> None:
+            states[x*rows + y] = state
+        self._export(self.root, self.origin, self.origin, set_state)
+        return bytes(states)
+
+    def get_state(self, x: int, y: int) -> int:
+        node = self.root
+        x -= self.origin
+        y -= self.origin
+        while not isinstance(node, int):
+            half = 1 << node.level-1
+            if x < half:
+                node = node.nw if y < half else node.sw
+            else:
+                node = node.ne if y < half else node.se
+                x -= half
+            if y >= half:
+                y -= half
+        return node
+
+    def set_state(self, x: int, y: int, state: int) -> None:
+        self.root = self._set(self.root, x-self.origin, y-self.origin, state)
+
+    def _set(self, node, x: int, y: int, state: int):
+        if isinstance(node, int):
+            return state
+        half = 1 << node.level-1
+        nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+        if x < half and y < half:
+            nw = self._set(nw, x, y, state)
+        elif y < half:
+            ne = self._set(ne, x-half, y, state)
+        elif x < half:
+            sw = self._set(sw, x, y-half, state)
+        else:
+            se = self._set(se, x-half, y-half, state)
+        return self._node(nw, ne, sw, se)
+
+    def clear(self) -> None:
+        self.root = self._build(self.root.level, self.origin, self.origin,
+                                lambda x, y: TPGameOfLife.DEAD)
+
+    def set_states(self, states: bytes) -> None:
+        rows = self.rows
+        self.root = self._build(self.root.level, self.origin, self.origin,
+                                lambda x, y: states[x*rows + y])
+
+    def reseed(self, seed: int) -> None:
+        super().reseed(seed)
+        self.generation = 0
+
+    def changes(self) -> List[Tuple[int, int, int, int]]:
+        tracked = self._tracked
+        self._tracked = (self.root, self.origin)
+        if (tracked is None or tracked[0].level != self.root.level or
+                tracked[1] != self.origin):
+            return None  # Not tracked yet, or the tree has grown
+        changes = []
+        self._diff(tracked[0], self.root, self.origin, self.origin, changes)
+        return changes
+
+    def _diff(self, old, new, x: int, y: int,
+              changes: List[Tuple[int, int, int, int]]) -> None:
+        """Add the cells that differ between old and new, two nodes at the
+        same level whose top left cell is (x, y), to changes. Identical
+        subtrees are skipped.
+        """
+        if old is new:
+            return
+        if isinstance(new, int):
+            if old != new:
+                changes.append((x, y, old, new))
+            return
+        half = 1 << new.level-1
+        self._diff(old.nw, new.nw, x, y, changes)
+        self._diff(old.ne, new.ne, x+half, y, changes)
+        self._diff(old.sw, new.sw, x, y+half, changes)
+        self._diff(old.se, new.se, x+half, y+half, changes)
+
+    def population(self, state: int) -> int:
+        if state == TPGameOfLife.RED:
+            return self.root.red
+        elif state == TPGameOfLife.GREEN:
+            return self.root.green
+        return self.columns*self.rows - self.root.red - self.root.green
+
+    def _centre(self, node):
+        """Return the node one level down at the centre of node."""
+        return self._node(node.nw.se, node.ne.sw, node.sw.ne, node.se.nw)
+
+    def _evolve(self, cells: List[List[int]], x: int, y: int) -> int:
+        """Return the next state of cells[y][x], given its neighbours in
+        cells, or -1-k if it takes a coin flip between the states of
+        rule.ties[k] to decide it.
+        """
+        state = cells[y][x]
+        if state == self.WALL:
+            return state
+        weights = self._weights
+        # The cell counts itself, which is taken back out
+        count = -weights[state]
+        for n_y in range(y-1, y+2):
+            for n_x in range(x-1, x+2):
+                count += weights[cells[n_y][n_x]]
+        return self.rule.table[state][count]
+
+    def _step_base(self, node, x: int, y: int, generation: int):
+        """Return the centre 2x2 of a level 2 node one generation later, and
+        whether a coin was flipped.
+        """
+        cells = [[node.nw.nw, node.nw.ne, node.ne.nw, node.ne.ne],
+                 [node.nw.sw, node.nw.se, node.ne.sw, node.ne.se],
+                 [node.sw.nw, node.sw.ne, node.se.nw, node.se.ne],
+                 [node.sw.sw, node.sw.se, node.se.sw, node.se.se]]
+        result = []
+        flipped = False
+        for c_y, c_x in ((1, 1), (1, 2), (2, 1), (2, 2)):
+            state = self._evolve(cells, c_x, c_y)
+            if state < 0:
+                state = coin_flip(self.seed, generation, x+c_x, y+c_y,
+                                  self.rule.ties[-1 - state])
+                flipped = True
+                self.flips += 1
+            result.append(state)
+        return self._node(*result), flipped
+
+    def _step(self, node, j: int, x: int, y: int, generation: int):
+        """Return the centre of node 2^j generations later, and whether a
+        coin was flipped along the way, where node's top left cell is (x, y)
+        on the grid and generation is its current generation.
+        """
+        key = (node, j)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached, False
+        self.misses += 1
+
+        if node.level == 2:
+            result, flipped = self._step_base(node, x, y, generation)
+        else:
+            nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+            quarter = 1 << node.level-2
+            eighth = quarter // 2
+            # Nine overlapping subnodes, row by row
+            subnodes = [
+                nw, self._node(nw.ne, ne.nw, nw.se, ne.sw), ne,
+                self._node(nw.sw, nw.se, sw.nw, sw.ne),
+                self._node(nw.se, ne.sw, sw.ne, se.nw),
+                self._node(ne.sw, ne.se, se.nw, se.ne),
+                sw, self._node(sw.ne, se.nw, sw.se, se.sw), se]
+
+            flipped = False
+            if j == node.level-2:
+                # Advance half of the way in the first round
+                half_step = 1 << j-1
+                parts = []
+                for i, subnode in enumerate(subnodes):
+                    part, flip = self._step(subnode, j-1,
+                                            x + (i % 3)*quarter,
+                                            y + (i // 3)*quarter, generation)
+                    parts.append(part)
+                    flipped = flipped or flip
+            else:
+                half_step = 0
+                parts = [self._centre(subnode) for subnode in subnodes]
+                j += 1  # The second round below takes the full step
+
+            quadrants = []
+            for i in (0, 1, 3, 4):
+                block = self._node(parts[i], parts[i+1], parts[i+3],
+                                   parts[i+4])
+                quadrant, flip = self._step(block, j-1,
+                                            x + eighth + (i % 3)*quarter,
+                                            y + eighth + (i // 3)*quarter,
+                                            generation + half_step)
+                quadrants.append(quadrant)
+                flipped = flipped or flip
+            result = self._node(*quadrants)
+
+        if not flipped:
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result, flipped
+
+    def _expand(self, node):
+        """Return the node one level up with node at its centre and WALL
+        around it.
+        """
+        wall = self._wall(node.level-1)
+        return self._node(self._node(wall, wall, wall, node.nw),
+                          self._node(wall, wall, node.ne, wall),
+                          self._node(wall, node.sw, wall, wall),
+                          self._node(node.se, wall, wall, wall))
+
+    def _collect(self) -> None:
+        """Discard every node that root does not use, and the cache."""
+        self._cache.clear()
+        nodes = {}
+        stack = [self.root] + self._walls[1:]
+        while stack:
+            node = stack.pop()
+            key = (node.nw, node.ne, node.sw, node.se)
+            if key not in nodes:
+                nodes[key] = node
+                if node.level > 1:
+                    stack.extend(key)
+        self._nodes = nodes
+
+    def step(self, j: int) -> None:
+        """Move forward 2^j generations."""
+        self.flips = 0
+        while self.root.level < j+2:
+            self.origin -= 1 << self.root.level-1
+            self.root = self._expand(self.root)
+        result, flipped = self._step(self.root, j, self.origin, self.origin,
+                                     self.generation)
+        # The result is centred on the old root, so growing it back by one
+        # level leaves origin where it was
+        self.root = self._expand(result)
+        self.generation += 1 << j
+        if len(self._nodes) > self.max_nodes:
+            self._collect()
+
+    def tick(self) -> None:
+        self.step(0)
+
+    def advance(self, generations: int) -> None:
+        flips = 0
+        j = 0
+        while generations:  # One step for every set bit of generations
+            if generations & 1:
+                self.step(j)
+                flips += self.flips
+            generations >>= 1
+            j += 1
+        self.flips = flips
+
+
+class SparseEngine(Engine):
+    """An Engine that only stores the live cells, in a dict keyed by
+    position, so that memory and tick time grow with the population rather
+    than the area.
+
+    The universe can be bounded like the grid of the other engines,
+    unbounded, so that patterns spread past the edges of the grid, or a
+    torus that wraps around at the edges. The grid then only sets which
+    cells states and population(DEAD) refer to.
+
+    Coin flips use coin_flip, so a bounded SparseEngine gives the same
+    results as a HashlifeEngine with the same seed. Only cells next to live
+    cells are evaluated, so rules under which a dead cell with no live
+    neighbours comes to life are refused.
+    """
+    TOPOLOGIES = ('unbounded', 'torus', 'bounded')
+
+    def __init__(self, columns: int, rows: int, seed: int = None,
+                 rule: Rule = None, topology: str = 'unbounded') -> None:
+        """Create SparseEngine object.
+
+        topology    'unbounded', 'torus' or 'bounded'
+        cells       The state of every live cell, by (x, y)
+        generation  The number of generations advanced so far
+        """
+        if topology not in self.TOPOLOGIES:
+            raise ValueError('Unknown topology: ' + repr(topology))
+        super().__init__(columns, rows, seed, rule)
+        if self.rule.table[TPGameOfLife.DEAD][0] != TPGameOfLife.DEAD:
+            raise ValueError('SparseEngine cannot follow rules under which '
+                             'isolated dead cells come to life')
+        self.topology = topology
+        self.bounded = topology == 'bounded'
+        self.cells = {}
+        self.generation = 0
+        # A copy of cells at the last call to changes, or None
+        self._tracked = None
+
+    def contains(self, x: int, y: int) -> bool:
+        return not self.bounded or super().contains(x, y)
+
+    def _wrap(self, x: int, y: int) -> Tuple[int, int]:
+        """Return the position that (x, y) refers to."""
+        if self.topology == 'torus':
+            return x % self.columns, y % self.rows
+        return x, y
+
+    def get_state(self, x: int, y: int) -> int:
+        return self.cells.get(self._wrap(x, y), TPGameOfLife.DEAD)
+
+    def set_state(self, x: int, y: int, state: int) -> None:
+        key = self._wrap(x, y)
+        if state == TPGameOfLife.DEAD:
+            self.cells.pop(key, None)
+        else:
+            self.cells[key] = state
+
+    def clear(self) -> None:
+        self.cells = {}
+
+    def viewport(self, x: int, y: int, columns: int, rows: int) -> bytes:
+        window = bytearray(columns * rows)
+        if columns * rows < len(self.cells):
+            for i in range(columns):
+                for j in range(rows):
+                    window[i*rows + j] = self.get_state(x+i, y+j)
+        else:
+            torus = self.topology == 'torus'
+            for (cell_x, cell_y), state in self.cells.items():
+                if torus:
+                    # Every copy of the cell in the window
+                    xs = range(x + (cell_x-x) % self.columns, x+columns,
+                               self.columns)
+                    ys = range(y + (cell_y-y) % self.rows, y+rows, self.rows)
+                elif 0 <= cell_x-x < columns and 0 <= cell_y-y < rows:
+                    xs, ys = (cell_x,), (cell_y,)
+                else:
+                    continue
+                for copy_x in xs:
+                    for copy_y in ys:
+                        window[(copy_x-x)*rows + copy_y-y] = state
+        return bytes(window)
+
+    def states(self) -> bytes:
+        return self.viewport(0, 0, self.columns, self.rows)
+
+    def set_states(self, states: bytes) -> None:
+        rows = self.rows
+        self.cells = cells = {}
+        for state in range(1, self.rule.states):
+            i = states.find(state)
+            while i != -1:
+                cells[divmod(i, rows)] = state
+                i = states.find(state, i+1)
+
+    def population(self, state: int) -> int:
+        if state == TPGameOfLife.DEAD:
+            return self.columns*self.rows - len(self.states().replace(
+                b'\x00', b''))
+        return list(self.cells.values()).count(state)
+
+    def reseed(self, seed: int) -> None:
+        super().reseed(seed)
+        self.generation = 0
+
+    def changes(self) -> List[Tuple[int, int, int, int]]:
+        old = self._tracked
+        cells = self.cells
+        self._tracked = dict(cells)
+        if old is None:
+            return None
+        DEAD = TPGameOfLife.DEAD
+        changes = [(x, y, state, cells.get((x, y), DEAD))
+                   for (x, y), state in old.items()
+                   if cells.get((x, y)) != state]
+        changes += [(x, y, DEAD, state) for (x, y), state in cells.items()
+                    if (x, y) not in old]
+        return changes
+
+    def tick(self) -> None:
+        weights = self.rule.weights
+        table = self.rule.table
+        cells = self.cells
+        columns = self.columns
+        rows = self.rows
+        torus = self.topology == 'torus'
+
+        # Neighbour counts of every cell next to a live cell
+        counts = {}
+        get = counts.get
+        for (x, y), state in cells.items():
+            weight = weights[state]
+            for n_x in (x-1, x, x+1):
+                for n_y in (y-1, y, y+1):
+                    if torus:
+                        key = (n_x % columns, n_y % rows)
+                    else:
+                        key = (n_x, n_y)
+                    counts[key] = get(key, 0) + weight
+        # Every live cell was counted as its own neighbour above
+        for key, state in cells.items():
+            counts[key] -= weights[state]
+
+        # Live cells with no live neighbours are not in counts, and die
+        next_cells = {}
+        flips = 0
+        bounded = self.bounded
+        for key, count in counts.items():
+            if bounded and not (0 <= key[0] < columns and
+                                0 <= key[1] < rows):
+                continue
+            state = table[cells.get(key, 0)][count]
+            if state < 0:
+                state = coin_flip(self.seed, self.generation, key[0], key[1],
+                                  self.rule.ties[-1 - state])
+                flips += 1
+            if state:
+                next_cells[key] = state
+        self.cells = next_cells
+        self.flips = flips
+        self.generation += 1
+
+
+class NumpyEngine(Engine):
+    """An Engine that holds the grid as a NumPy array and computes each
+    generation with whole-array operations instead of per-cell loops.
+    """
+
+    def __init__(self, columns: int, rows: int, seed: int = None,
+                 rule: Rule = None) -> None:
+        """Create NumpyEngine object.
+
+        grid        A uint8 array of cell states, indexed by [x, y]
+        rng         The vectorized random number generator used for coin flips
+        """
+        global np
+        if np is None:
+            try:
+                import numpy as np
+            except ImportError:
+                raise ImportError('The numpy engine requires the numpy module')
+        super().__init__(columns, rows, seed, rule)
+        self.grid = np.zeros((columns, rows), dtype=np.uint8)
+        self.rng = np.random.default_rng(self.seed)
+        self._weights, self._table, self._ties = self._compile(self.rule)
+        # Zero-bordered scratch plane of neighbour weights, so that shifted
+        # slices never wrap
+        self._padded = np.zeros((columns+2, rows+2),
+                                dtype=self._weights.dtype)
+
+    @staticmethod
+    def _compile(rule: Rule) -> Tuple['np.ndarray', 'np.ndarray',
+                                      List['np.ndarray']]:
+        """Return the weights of rule as an array indexed by state, in the
+        smallest unsigned type that holds every index into the table, its
+        table as a flat array indexed by state*9^colours + count, and its
+        ties as arrays.
+        """
+        size = rule.states * 9**rule.colours
+        dtype = (np.uint8 if size <= 1 << 8 else
+                 np.uint16 if size <= 1 << 16 else np.uint32)
+        table = np.array(rule.table, dtype=np.int8 if rule.states < 128
+                         else np.int16).ravel()
+        return (np.array(rule.weights, dtype=dtype), table,
+                [np.array(choices, dtype=table.dtype)
+                 for choices in rule.ties])
+
+    def get_state(self, x: int, y: int) -> int:
+        return int(self.grid[x, y])
+
+    def set_state(self, x: int, y: int, state: int) -> None:
+        self.grid[x, y] = state
+
+    def clear(self) -> None:
+        self.grid.fill(TPGameOfLife.DEAD)
+
+    def states(self) -> bytes:
+        return self.grid.tobytes()
+
+    def set_states(self, states: bytes) -> None:
+        self.grid[:] = np.frombuffer(states, dtype=np.uint8).reshape(
+            self.columns, self.rows)
+
+    def reseed(self, seed: int) -> None:
+        super().reseed(seed)
+        self.rng = np.random.default_rng(self.seed)
+
+    def population(self, state: int) -> int:
+        return int(np.count_nonzero(self.grid == state))
+
+    @staticmethod
+    def _count(padded: 'np.ndarray') -> 'np.ndarray':
+        """Return the number of live neighbours of every cell, given a
+        zero-bordered plane of live cells (or a stack of planes, bordered
+        in their last two dimensions).
+        """
+        return (padded[..., :-2, :-2] + padded[..., :-2, 1:-1]
+                + padded[..., :-2, 2:] + padded[..., 1:-1, :-2]
+                + padded[..., 1:-1, 2:] + padded[..., 2:, :-2]
+                + padded[..., 2:, 1:-1] + padded[..., 2:, 2:])
+
+    def tick(self) -> None:
+        grid = self.grid
+        weights = self._weights
+
+        # The neighbour count of every cell, then its entry in the table
+        np.take(weights, grid, out=self._padded[1:-1, 1:-1])
+        index = self._count(self._padded)
+        index += grid.astype(weights.dtype) * weights.dtype.type(
+            9**self.rule.colours)
+        next_grid = np.take(self._table, index)
+
+        self.flips = flips = int(np.count_nonzero(next_grid < 0))
+        if flips:
+            for k, choices in enumerate(self._ties):
+                tie = next_grid == -1 - k
+                n = flips if len(self._ties) == 1 else np.count_nonzero(tie)
+                if n:
+                    next_grid[tie] = choices[self.rng.integers(
+                        0, len(choices), n)]
+        grid[:] = next_grid
+
+
+class Ensemble:
+    """Many independent boards of the same size, advanced together as one
+    stacked NumPy array, so that the cost of each generation is shared by
+    all of them.
+
+    Every board has its own coin flip seed; coin flips use coin_flip, so a
+    board gives the same results as a HashlifeEngine or ParallelEngine with
+    its seed. Boards that are won, or that settle into a still life or
+    cycle, are frozen and no longer computed.
+    """
+
+    def __init__(self, columns: int, rows: int, seeds: List[int],
+                 rule: Rule = None) -> None:
+        """Create Ensemble object.
+
+        rule        The Rule the cells follow (default p2life)
+        boards      The number of boards, one per seed
+        seeds       The seed of each board, as a uint64 array, with a fresh
+                    one drawn for None
+        grid        A uint8 array of cell states, indexed by [board, x, y]
+        generation  The number of generations advanced so far
+        flips       The number of coin flips on each board in the last tick
+        """
+        global np
+        if np is None:
+            try:
+                import numpy as np
+            except ImportError:
+                raise ImportError('Ensemble requires the numpy module')
+        self.columns = columns
+        self.rows = rows
+        self.rule = rule or RULES['p2life']
+        self.boards = len(seeds)
+        self.seeds = np.array([(new_seed() if seed is None else seed)
+                               & _MASK64 for seed in seeds],
+                              dtype=np.uint64)
+        self.grid = np.zeros((self.boards, columns, rows), dtype=np.uint8)
+        self.generation = 0
+        self.flips = np.zeros(self.boards, dtype=np.int64)
+        # Cell coordinates, for hashing coin flips
+        self._x = np.arange(columns, dtype=np.uint64)
+        self._y = np.arange(rows, dtype=np.uint64)
+        self._weights, self._table, self._ties = NumpyEngine._compile(
+            self.rule)
+        # A random key per cell; a board hashes to the sum of its cells'
+        # keys times their states, wrapping at 2^64
+        self._keys = np.random.default_rng(0).integers(
+            0, 1 << 64, (columns, rows), dtype=np.uint64, endpoint=False)
+
+    def set_states(self, states: bytes, board: int = None) -> None:
+        """Set the states of all cells of a board, or of every board, as
+        returned by TPGameOfLife.states.
+        """
+        grid = np.frombuffer(states, dtype=np.uint8).reshape(self.columns,
+                                                             self.rows)
+        if board is None:
+            self.grid[:] = grid
+        else:
+            self.grid[board] = grid
+
+    def states(self, board: int) -> bytes:
+        """Return the states of all cells of a board, column by column."""
+        return self.grid[board].tobytes()
+
+    def population(self, state: int) -> 'np.ndarray':
+        """Return the number of cells with the given state on each board."""
+        return np.count_nonzero(self.grid == state, axis=(1, 2))
+
+    def _coin_flips(self, boards: 'np.ndarray', x: 'np.ndarray',
+                    y: 'np.ndarray', choices: 'np.ndarray') -> 'np.ndarray':
+        """Return coin_flip for the given boards and positions, as an array
+        of states.
+        """
+        u = np.uint64
+        h = (self.seeds[boards]*u(_FLIP_SEED)
+             + u(self.generation*_FLIP_GENERATION & _MASK64)
+             + self._x[x]*u(_FLIP_X) + self._y[y]*u(_FLIP_Y))
+        # _mix64, wrapping like its masks
+        h = (h ^ (h >> u(30)))*u(_MIX_1)
+        h = (h ^ (h >> u(27)))*u(_MIX_2)
+        h ^= h >> u(31)
+        return choices[len(choices)-1 - (h % u(len(choices))).astype(np.intp)]
+
+    def tick(self, active: 'np.ndarray' = None) -> None:
+        """Move the boards where active is True (default all) forward one
+        generation.
+        """
+        boards = (np.arange(self.boards) if active is None
+                  else np.flatnonzero(active))
+        grid = self.grid if len(boards) == self.boards else self.grid[boards]
+        weights = self._weights
+
+        # The neighbour count of every cell, then its entry in the table
+        padded = np.zeros((len(boards), self.columns+2, self.rows+2),
+                          dtype=weights.dtype)
+        np.take(weights, grid, out=padded[:, 1:-1, 1:-1])
+        index = NumpyEngine._count(padded)
+        index += grid.astype(weights.dtype) * weights.dtype.type(
+            9**self.rule.colours)
+        next_grid = np.take(self._table, index)
+
+        ties = next_grid < 0
+        self.flips[:] = 0
+        self.flips[boards] = np.count_nonzero(ties, axis=(1, 2))
+        if self.flips.any():
+            b, x, y = np.nonzero(ties)
+            for k, choices in enumerate(self._ties):
+                tie = next_grid[b, x, y] == -1 - k
+                next_grid[b[tie], x[tie], y[tie]] = self._coin_flips(
+                    boards[b[tie]], x[tie], y[tie], choices)
+        self.grid[boards] = next_grid
+        self.generation += 1
+
+    def _hashes(self) -> 'np.ndarray':
+        """Return the hash of the grid of every board."""
+        return (self.grid * self._keys).sum(axis=(1, 2), dtype=np.uint64)
+
+    def run(self, generations: int, starting_births: int, max_births: int,
+            placements: List[List[Tuple[int, int, int]]] = None,
+            history: int = 4096) -> Dict[str, 'np.ndarray']:
+        """Play every board for up to the given number of generations, or
+        until it is won or stable, and return statistics as arrays indexed
+        by board.
+
+        placements is a list of (generation, x, y) green cells to place for
+        each board, with the same birth budget as batch.run. A stable board
+        with no placements left is frozen, and its final populations are
+        taken from its cycle. As with CycleDetector, boards are compared by
+        hash, and history is the longest period that can be detected.
+
+        win         The first generation without red cells, or -1
+        cycle_start The generation a board became stable, or -1
+        period      The period of the cycle a board settled into (1 for a
+                    still life), or 0 if none was found
+        red_curve   Red cells on every board in every generation, indexed
+                    by [generation, board]; a won board keeps its last count
+        green_curve As red_curve, for green cells
+        """
+        boards = self.boards
+        due = {}  # generation -> [(board, x, y)]
+        last_placement = np.full(boards, -1)
+        for board, board_placements in enumerate(placements or ()):
+            for generation, x, y in board_placements:
+                due.setdefault(generation, []).append((board, x, y))
+                last_placement[board] = max(last_placement[board], generation)
+
+        births = np.full(boards, starting_births)
+        placed = np.zeros(boards, dtype=np.int64)
+        rejected = np.zeros(boards, dtype=np.int64)
+        win = np.full(boards, -1)
+        cycle_start = np.full(boards, -1)
+        period = np.zeros(boards, dtype=np.int64)
+        active = np.ones(boards, dtype=bool)
+        red_curve = np.zeros((generations+1, boards), dtype=np.int32)
+        green_curve = np.zeros((generations+1, boards), dtype=np.int32)
+        # The hashes of the grids of recent generations, by generation
+        # modulo history
+        history = min(history, generations+1)
+        hashes = np.zeros((history, boards), dtype=np.uint64)
+        back = np.arange(1, history+1)  # Generations back, by row of matches
+        last_flip = np.full(boards, -1)  # The last generation with flips
+
+        self.generation = 0
+        while True:
+            generation = self.generation
+            for board, x, y in due.get(generation, ()):
+                if not active[board]:
+                    continue
+                if (births[board] >= 1 and 0 <= x < self.columns and
+                        0 <= y < self.rows and
+                        self.grid[board, x, y] == TPGameOfLife.DEAD):
+                    self.grid[board, x, y] = TPGameOfLife.GREEN
+                    births[board] -= 1
+                    placed[board] += 1
+                else:
+                    rejected[board] += 1
+
+            self._record(red_curve, green_curve, generation, active, period)
+            won = active & (red_curve[generation] == 0)
+            win[won] = generation
+            active &= ~won
+
+            # Boards that repeat a recent grid, with no coin flipped and no
+            # cell placed since, stay in that cycle for good; the nearest
+            # repeat gives the period
+            current = self._hashes()
+            matches = ((hashes[(generation - back) % history] == current)
+                       & (back[:, None] <= generation - np.maximum(
+                           np.maximum(last_flip, last_placement), 0)))
+            same = active & matches.any(axis=0)
+            period[same] = matches.argmax(axis=0)[same] + 1
+            cycle_start[same] = generation - period[same]
+            active &= ~same
+            hashes[generation % history] = current
+
+            if generation >= generations or not active.any():
+                break
+            births[active & (births < max_births)] += 1
+            self.tick(active)
+            last_flip[self.flips > 0] = generation + 1
+
+        for generation in range(self.generation+1, generations+1):
+            self._record(red_curve, green_curve, generation, active, period)
+        ends = np.where(win >= 0, win, generations)
+        return {
+            'generations': ends,
+            'win': win,
+            'red': red_curve[ends, np.arange(boards)],
+            'green': green_curve[ends, np.arange(boards)],
+            'placed': placed,
+            'rejected': rejected,
+            'cycle_start': cycle_start,
+            'period': period,
+            'red_curve': red_curve,
+            'green_curve': green_curve,
+        }
+
+    def _record(self, red_curve: 'np.ndarray', green_curve: 'np.ndarray',
+                generation: int, active: 'np.ndarray',
+                period: 'np.ndarray') -> None:
+        """Fill in the populations at generation: counted on active boards,
+        repeated from the cycle on stable boards, and carried over on the
+        rest.
+        """
+        frozen = np.flatnonzero(~active)
+        back = np.where(period[frozen] > 0, period[frozen], 1)
+        for curve, state in ((red_curve, TPGameOfLife.RED),
+                             (green_curve, TPGameOfLife.GREEN)):
+            if active.any():
+                curve[generation, active] = np.count_nonzero(
+                    self.grid[active] == state, axis=(1, 2))
+            if generation:
+                curve[generation, frozen] = curve[generation - back, frozen]
+
+    def summary(self, results: Dict[str, 'np.ndarray']) -> Dict[str, object]:
+        """Return aggregate statistics of the results of run."""
+        wins = results['win'][results['win'] >= 0]
+        summary = {
+            'boards': self.boards,
+            'wins': len(wins),
+            'win_rate': round(len(wins) / self.boards, 4),
+            'stable': int(np.count_nonzero(results['period'])),
+            'win_generations': {int(generation): int(count) for
+                                generation, count in
+                                zip(*np.unique(wins, return_counts=True))},
+            'mean_red': [round(float(red), 2) for red in
+                         results['red_curve'].mean(axis=1)],
+            'mean_green': [round(float(green), 2) for green in
+                           results['green_curve'].mean(axis=1)],
+        }
+        if len(wins):
+            summary['win_percentiles'] = {
+                percentile: float(np.percentile(wins, percentile))
+                for percentile in (10, 50, 90)}
+        return summary
+
+
+# Engines selectable by name when creating a TPGameOfLife
+ENGINES = {
+    'python': PythonEngine,
+    'incremental': IncrementalEngine,
+    'bitplane': BitplaneEngine,
+    'numpy': NumpyEngine,
+    'hashlife': HashlifeEngine,
+    'parallel': ParallelEngine,
+    'sparse': SparseEngine,
+}
+
+
+# The directory of the built-in levels
+LEVELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'levels')
+# Level file header: magic, version, name length, starting births, maximum
+# births, columns, rows. The header is followed by the name (UTF-8) and two
+# planes, red then green, of one bit per cell, column by column, lowest bit
+# first.
+LEVEL_HEADER = struct.Struct('<4sBBHHII')
+LEVEL_MAGIC = b'GOLG'
+LEVEL_VERSION = 1
+
+
+class LevelInfo(NamedTuple):
+    """The header of a level file."""
+    path: str
+    name: str
+    starting_births: int
+    max_births: int
+    columns: int
+    rows: int
+    offset: int  # Where the planes start in the file
+
+
+def _plane_size(cells: int) -> int:
+    """Return the number of bytes of one plane of a number of cells."""
+    return (cells + 7) // 8
+
+
+def _pack_planes(states: bytes, colours: int = 2) -> bytes:
+    """Return cell states packed into one plane of one bit per cell for
+    every live state up to colours, red and green first, lowest bit first.
+
+    A ValueError is raised for states beyond colours, which would be lost.
+    """
+    if states.translate(None, bytes(range(colours+1))):
+        raise ValueError('Cannot pack states beyond {} colours'.format(
+            colours))
+    size = _plane_size(len(states))
+    planes = []
+    for state in range(1, colours+1):
+        # Bits from the highest down, as a string of '0's and '1's
+        state_bits = bytearray(b'0' * 256)
+        state_bits[state] = b'1'[0]
+        bits = states.translate(state_bits)[::-1]
+        planes.append(int(bits or b'0', 2).to_bytes(size, 'little'))
+    return b''.join(planes)
+
+
+def _unpack_planes(data: bytes, cells: int) -> bytes:
+    """Return the states of the cells packed by _pack_planes into data (any
+    bytes-like object), with as many colours as there are planes in data.
+    """
+    size = _plane_size(cells)
+    states = 0
+    for state in range(1, len(data) // size + 1 if size else 1):
+        bits = int.from_bytes(data[(state-1)*size:state*size], 'little')
+        # Bits from the lowest up, as a string of '0's and '1's
+        bits = bin(bits | 1 << 8*size)[:2:-1][:cells]
+        bit_states = bytes.maketrans(b'01', bytes((0, state)))
+        states += int.from_bytes(bits.encode().translate(bit_states),
+                                 'little')
+    return states.to_bytes(cells, 'little')
+
+
+def read_level_info(path: str) -> LevelInfo:
+    """Return the header of the level file at path, without reading the
+    cells.
+    """
+    with open(path, 'rb') as level_file:
+        header = level_file.read(LEVEL_HEADER.size)
+        if len(header) < LEVEL_HEADER.size:
+            raise ValueError('Not a level file: ' + repr(path))
+        (magic, version, name_length, starting_births, max_births, columns,
+         rows) = LEVEL_HEADER.unpack(header)
+        if magic != LEVEL_MAGIC or version != LEVEL_VERSION:
+            raise ValueError('Not a level file: ' + repr(path))
+        name = level_file.read(name_length).decode('utf-8')
+    return LevelInfo(path, name, starting_births, max_births, columns, rows,
+                     LEVEL_HEADER.size + name_length)
+
+
+def write_level(path: str, name: str, starting_births: int,
+                max_births: int, columns: int, rows: int,
+                states: bytes) -> None:
+    """Save a level as a level file.
+
+    states      The states of all cells, column by column, as returned by
+                TPGameOfLife.states; only red and green cells can be saved
+    """
+    planes = _pack_planes(states)
+    name = name.encode('utf-8')
+    with open(path, 'wb') as level_file:
+        level_file.write(LEVEL_HEADER.pack(
+            LEVEL_MAGIC, LEVEL_VERSION, len(name), starting_births,
+            max_births, columns, rows))
+        level_file.write(name)
+        level_file.write(planes)
+
+
+def load_level(tpgol: TPGameOfLife, level) -> LevelInfo:
+    """Replace the grid of tpgol with the cells of a level and return its
+    header.
+
+    level is a LevelInfo or the path of a level file. The file is memory
+    mapped and its planes are widened into cell states in bulk and written
+    with TPGameOfLife.set_states, so no Python object is made per cell. A
+    level of a different size than tpgol is centred on it, and cropped if
+    it does not fit.
+    """
+    if not isinstance(level, LevelInfo):
+        level = read_level_info(level)
+    cells = level.columns * level.rows
+    end = level.offset + 2*_plane_size(cells)
+    with open(level.path, 'rb') as level_file:
+        with mmap.mmap(level_file.fileno(), 0,
+                       access=mmap.ACCESS_READ) as data:
+            if len(data) < end:
+                raise ValueError('Truncated level file: '
+                                 + repr(level.path))
+            # A view, so that the planes are read from the mapping itself;
+            # it must be released before the mapping is closed
+            with memoryview(data) as view:
+                states = _unpack_planes(view[level.offset:end], cells)
+
+    if (level.columns, level.rows) != (tpgol.columns, tpgol.rows):
+        # Copy the overlapping part of every column into place
+        grid = bytearray(tpgol.columns * tpgol.rows)
+        dx = (tpgol.columns - level.columns) // 2
+        dy = (tpgol.rows - level.rows) // 2
+        y_start = max(0, -dy)
+        y_end = min(level.rows, tpgol.rows - dy)
+        for x in range(max(0, -dx), min(level.columns, tpgol.columns - dx)):
+            start = (x+dx)*tpgol.rows + y_start + dy
+            grid[start:start + y_end-y_start] = states[
+                x*level.rows + y_start:x*level.rows + y_end]
+        states = bytes(grid)
+    tpgol.set_states(states)
+    return level
+
+
+class LevelIndex:
+    """The level files in a directory, in order of file name.
+
+    Only the headers are read, so a directory of hundreds of levels is
+    indexed without loading any of them. The index is rescanned when the
+    directory changes.
+    """
+
+    def __init__(self, directory: str = LEVELS_DIR,
+                 extension: str = '.golg') -> None:
+        """Create LevelIndex object.
+
+        directory   The directory to scan
+        extension   The file extension of level files
+        """
+        self.directory = directory
+        self.extension = extension
+        self._mtime = None
+        self._levels = []
+
+    @property
+    def levels(self) -> List[LevelInfo]:
+        """The headers of the levels, in order of file name."""
+        mtime = os.stat(self.directory).st_mtime_ns
+        if mtime != self._mtime:
+            with os.scandir(self.directory) as entries:
+                paths = sorted(entry.path for entry in entries
+                               if entry.name.endswith(self.extension)
+                               and entry.is_file())
+            self._levels = [read_level_info(path) for path in paths]
+            self._mtime = mtime
+        return self._levels
+
+    def __len__(self) -> int:
+        return len(self.levels)
+
+    def __getitem__(self, index: int) -> LevelInfo:
+        return self.levels[index]
+
+    def level(self, number: int) -> LevelInfo:
+        """Return the header of level number (counting from 1)."""
+        if not 1 <= number <= len(self.levels):
+            raise ValueError('Unknown level: ' + repr(number))
+        return self.levels[number-1]
+
+
+def _zobrist_key(x: int, y: int, state: int) -> int:
+    """Return the 64-bit key of the cell at (x, y) having the given state,
+    with 0 for dead cells.
+    """
+    if state == TPGameOfLife.DEAD:
+        return 0
+    return _mix64((x*0x9E3779B97F4A7C15 + y*0xC2B2AE3D27D4EB4F
+                   + state*0x165667B19E3779F9) & _MASK64)
+
+
+class CycleDetector:
+    """Detects when a TPGameOfLife has settled into a still life or cycle.
+
+    The board is hashed Zobrist-style, as the XOR of a key for every live
+    cell and its state, so that after a tick only the cells that changed
+    are hashed out and back in. Engines that report the cells that changed
+    (see Engine.changes) are never read in full; for the others, the board
+    is compared with a copy of the last one. The generation each recent
+    hash was seen at is kept, and a hash coming round again means the board
+    will repeat forever, unless a coin was flipped since then: the flips
+    could go differently the next time round.
+    """
+
+    def __init__(self, tpgol: TPGameOfLife, history: int = 4096) -> None:
+        """Create CycleDetector object.
+
+        tpgol       The TPGameOfLife to watch
+        history     How many recent hashes to keep, i.e. the longest period
+                    that can be detected
+        generation  The number of ticks since the detector was created
+        hash        The hash of the board at generation
+        cycle       (first generation, period) of the cycle the board is
+                    in, or None if none was found; a period of 1 means the
+                    board stopped changing
+        """
+        self.tpgol = tpgol
+        self.history = history
+        self.generation = 0
+        self.hash = 0
+        self._states = None  # The last board read in full, if any
+        self.reset()
+
+    def _rehash(self) -> None:
+        """Update hash for the cells that changed since the last call."""
+        h = self.hash
+        changes = self.tpgol.engine.changes()
+        if changes is not None:
+            for x, y, old, new in changes:
+                h ^= _zobrist_key(x, y, old) ^ _zobrist_key(x, y, new)
+            self._states = None
+        else:
+            states = self.tpgol.states()
+            old = self._states
+            if old is None:  # Hash the whole board afresh
+                old = bytes(len(states))
+                h = 0
+            rows = self.tpgol.rows
+            for start in range(0, len(states), rows):
+                end = start + rows
+                if old[start:end] != states[start:end]:  # Whole columns
+                    x = start // rows
+                    for i in range(start, end):
+                        if old[i] != states[i]:
+                            h ^= (_zobrist_key(x, i-start, old[i])
+                                  ^ _zobrist_key(x, i-start, states[i]))
+            self._states = states
+        # Cells of an unbounded universe that were off the grid when the
+        # board was last read in full are left out of hash, but as the
+        # hash is an XOR, that only offsets it by the same key throughout
+        self.hash = h
+
+    def reset(self) -> None:
+        """Forget the hashes seen so far, as needed after the board was
+        changed other than by ticking.
+        """
+        self._rehash()
+        self._seen = OrderedDict([(self.hash, self.generation)])
+        self._flipped = self.generation  # The last generation born of flips
+        self.cycle = None
+
+    def update(self) -> Tuple[int, int]:
+        """Take note of the board after a tick and return cycle."""
+        self.generation += 1
+        if self.tpgol.engine.flips:
+            self._flipped = self.generation
+        self._rehash()
+        if self.cycle is None:
+            seen = self._seen.pop(self.hash, None)
+            if seen is not None and seen >= self._flipped:
+                self.cycle = (seen, self.generation - seen)
+            self._seen[self.hash] = self.generation
+            if len(self._seen) > self.history:
+                self._seen.popitem(last=False)
+        return self.cycle
+
+
+class Snapshot(NamedTuple):
+    """The state of a Simulation at one generation."""
+    generation: int
+    states: bytes  # As returned by TPGameOfLife.states
+    births: int  # Births available to the player
+    red: int  # Number of red cells
+    green: int  # Number of green cells
+    placed: Tuple[Tuple[int, int, int], ...]  # (generation, x, y) of the
+                                              # green cells placed so far
+    win: int  # The first generation without red cells, or None
+    viewport: Tuple[int, int] = (0, 0)  # The cell that states start at
+
+
+# The directory that games are recorded into
+REPLAYS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'replays')
+# Replay file header: magic, version, whether there is a seed, engine name
+# length, rule name length, engine options length, columns, rows, seed,
+# starting births, maximum births. The header is followed by the engine
+# name and the rule name (ASCII), the engine options (a JSON object) and
+# then records, each a REPLAY_RECORD header followed by its payload.
+REPLAY_HEADER = struct.Struct('<4sBBBBHIIqHH')
+REPLAY_MAGIC = b'GOLR'
+REPLAY_VERSION = 3
+# Record header: kind, generation, payload length
+REPLAY_RECORD = struct.Struct('<cII')
+# Kinds of record. Keyframes and diffs start with a REPLAY_FRAME, keyframes
+# continue with the grid packed like in a level file, with a plane for
+# every colour of the rule the game was played under, and diffs with the
+# positions (uint32) and then the new states of the cells that changed.
+# Placements are the x and y (int32) of a green cell placed by the player.
+KEYFRAME = b'K'
+DIFF = b'D'
+PLACEMENT = b'P'
+# Frame prefix: births available, red cells, green cells
+REPLAY_FRAME = struct.Struct('<HII')
+REPLAY_PLACEMENT = struct.Struct('<ii')
+
+
+class ReplayRecorder:
+    """Records a game into an append-only replay file.
+
+    Every frame is stored as the cells that changed since the previous
+    frame, with a keyframe of the whole grid every keyframe_interval
+    generations (or whenever a diff would be larger), so that a
+    ReplayReader can seek without replaying from the start. Records are
+    written through a buffer and flushed on close.
+    """
+
+    def __init__(self, path: str, tpgol: TPGameOfLife, starting_births: int,
+                 max_births: int, keyframe_interval: int = 100,
+                 buffer_size: int = 1 << 16) -> None:
+        """Create ReplayRecorder object and write the header.
+
+        tpgol must have been seeded (see TPGameOfLife.reseed), and follow
+        one of RULES, for the replay to be reproducible.
+
+        path                The replay file to create
+        tpgol               The TPGameOfLife being played
+        keyframe_interval   Generations between keyframes
+        """
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self._file = open(path, 'wb', buffering=buffer_size)
+        seed = tpgol.engine.seed
+        engine = tpgol.engine_name.encode('ascii')
+        rule = tpgol.rule.name.encode('ascii')
+        options = json.dumps(tpgol.options, sort_keys=True).encode('ascii')
+        self._file.write(REPLAY_HEADER.pack(
+            REPLAY_MAGIC, REPLAY_VERSION, True, len(engine), len(rule),
+            len(options), tpgol.columns, tpgol.rows, seed,
+            starting_births, max_births))
+        self._file.write(engine)
+        self._file.write(rule)
+        self._file.write(options)
+        self._rows = tpgol.rows
+        self._colours = tpgol.rule.colours
+        self._states = None
+        self._keyframe = None  # The generation of the last keyframe
+
+    def _write(self, kind: bytes, generation: int, *payload: bytes) -> None:
+        """Append a record."""
+        self._file.write(REPLAY_RECORD.pack(kind, generation,
+                                            sum(map(len, payload))))
+        for part in payload:
+            self._file.write(part)
+
+    def record(self, generation: int, states: bytes, births: int, red: int,
+               green: int) -> None:
+        """Record the grid, as returned by TPGameOfLife.states, if it
+        changed since the last call, the births available, and the red and
+        green populations (as returned by TPGameOfLife.population, which
+        on an unbounded engine counts cells off the grid too).
+        """
+        old = self._states
+        self._states = states
+        frame = REPLAY_FRAME.pack(births, red, green)
+        if (old is not None and
+                generation < self._keyframe + self.keyframe_interval):
+            rows = self._rows
+            changed = array.array('I')
+            for start in range(0, len(states), rows):
+                end = start + rows
+                if old[start:end] != states[start:end]:
+                    changed.extend(i for i in range(start, end)
+                                   if old[i] != states[i])
+            # Five bytes per changed cell against a bit per cell and colour
+            if 5*len(changed) < self._colours * len(states) // 8:
+                if sys.byteorder == 'big':
+                    positions = array.array('I', changed)
+                    positions.byteswap()
+                else:
+                    positions = changed
+                self._write(DIFF, generation, frame, positions.tobytes(),
+                            bytes(states[i] for i in changed))
+                return
+        self._write(KEYFRAME, generation, frame,
+                    _pack_planes(states, self._colours))
+        self._keyframe = generation
+
+    def place(self, generation: int, x: int, y: int) -> None:
+        """Record a green cell placed by the player."""
+        self._write(PLACEMENT, generation, REPLAY_PLACEMENT.pack(x, y))
+
+    def close(self) -> None:
+        """Flush and close the replay file."""
+        self._file.close()
+
+
+class ReplayReader:
+    """Reads a replay file written by a ReplayRecorder.
+
+    Opening the file only reads the record headers and frame prefixes, to
+    index the keyframes and placements; seek then decodes the nearest
+    keyframe at or before a generation and applies the diffs after it. A
+    file cut short, e.g. by a crash, is read up to its last whole record.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Create ReplayReader object.
+
+        seed            The coin flip seed of the game, or None
+        engine          The name of the engine the game was played with
+        rule            The name of the Rule the game was played under
+        options         The further arguments the engine was created with
+        generations     The last generation recorded
+        placements      (generation, x, y) of every green cell placed
+        win             The first generation without red cells, or None
+        """
+        self.path = path
+        with open(path, 'rb') as replay_file:
+            self._data = mmap.mmap(replay_file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        data = self._data
+        if len(data) < REPLAY_HEADER.size:
+            data.close()
+            raise ValueError('Not a replay file: ' + repr(path))
+        (magic, version, has_seed, engine_length, rule_length,
+         options_length, self.columns, self.rows, seed,
+         self.starting_births, self.max_births) = (
+            REPLAY_HEADER.unpack_from(data))
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            data.close()
+            raise ValueError('Not a replay file: ' + repr(path))
+        self.seed = seed if has_seed else None
+        offset = REPLAY_HEADER.size + engine_length
+        self.engine = data[REPLAY_HEADER.size:offset].decode('ascii')
+        self.rule = data[offset:offset + rule_length].decode('ascii')
+        offset += rule_length
+        self.options = json.loads(
+            data[offset:offset + options_length].decode('ascii'))
+        offset += options_length
+
+        self.generations = 0
+        self.placements = []
+        self.win = None
+        self._keyframes = []  # (generation, offset) of every keyframe
+        self._placements = []  # (offset, placement) of every placement
+        self._start = offset
+        while offset + REPLAY_RECORD.size <= len(data):
+            kind, generation, length = REPLAY_RECORD.unpack_from(data, offset)
+            payload = offset + REPLAY_RECORD.size
+            if payload + length > len(data):
+                break
+            if kind == PLACEMENT:
+                placement = ((generation,)
+                             + REPLAY_PLACEMENT.unpack_from(data, payload))
+                self.placements.append(placement)
+                self._placements.append((offset, placement))
+            else:
+                if kind == KEYFRAME:
+                    self._keyframes.append((generation, offset))
+                red = REPLAY_FRAME.unpack_from(data, payload)[1]
+                if not red and self.win is None:
+                    self.win = generation
+            self.generations = generation
+            offset = payload + length
+        self._end = offset
+        if not self._keyframes:
+            self._data.close()
+            raise ValueError('Empty replay file: ' + repr(path))
+
+    def close(self) -> None:
+        """Close the replay file."""
+        self._data.close()
+
+    def frames(self, generation: int = 0):
+        """Yield a Snapshot of every recorded frame, from the last one at or
+        before generation.
+        """
+        data = self._data
+        cells = self.columns * self.rows
+        keyframe = max(0, bisect.bisect_right(self._keyframes,
+                                              (generation, len(data))) - 1)
+        offset = self._keyframes[keyframe][1]
+        placed = tuple(placement for placement_offset, placement
+                       in self._placements if placement_offset < offset)
+        states = None
+        pending = None  # The latest frame at or before generation
+        while offset < self._end:
+            kind, record_generation, length = REPLAY_RECORD.unpack_from(
+                data, offset)
+            payload = offset + REPLAY_RECORD.size
+            offset = payload + length
+            if kind == PLACEMENT:
+                placed += ((record_generation,)
+                           + REPLAY_PLACEMENT.unpack_from(data, payload),)
+                continue
+
+            births, red, green = REPLAY_FRAME.unpack_from(data, payload)
+            payload += REPLAY_FRAME.size
+            if kind == KEYFRAME:
+                states = bytearray(_unpack_planes(data[payload:offset],
+                                                  cells))
+            else:
+                count = (offset - payload) // 5
+                positions = array.array('I', data[payload:payload+4*count])
+                if sys.byteorder == 'big':
+                    positions.byteswap()
+                for i, state in zip(positions, data[payload+4*count:offset]):
+                    states[i] = state
+            win = self.win
+            if win is not None and win > record_generation:
+                win = None
+            snapshot = Snapshot(record_generation, bytes(states), births, red,
+                                green, placed, win)
+            if record_generation <= generation:
+                pending = snapshot
+                continue
+            if pending is not None:
+                yield pending
+                pending = None
+            yield snapshot
+        if pending is not None:
+            yield pending
+
+    def seek(self, generation: int) -> Snapshot:
+        """Return the last frame at or before generation."""
+        return next(self.frames(generation))
+
+    def start(self) -> TPGameOfLife:
+        """Return a TPGameOfLife set up like the recorded game at its first
+        frame, to replay it with the recorded placements.
+        """
+        tpgol = TPGameOfLife(self.columns, self.rows, self.engine, self.seed,
+                             self.rule, **self.options)
+        tpgol.set_states(self.seek(0).states)
+        return tpgol
+
+
+class Simulation:
+    """Runs a TPGameOfLife on a background thread, publishing a Snapshot
+    after every change so that the game can draw and take input without
+    waiting for ticks.
+
+    Green cells are placed by queueing them with the generation they were
+    placed at. The thread applies each placement before ticking past that
+    generation, or straight away if it has already passed it, so the game
+    is the same however fast the board is drawn. As in the game, a
+    placement needs an available birth and a dead cell, and one birth is
+    regained (up to max_births) every generation.
+    """
+    # Speeds as multiples of one generation per interval, None for as fast
+    # as possible
+    SPEEDS = (1, 10, 100, None)
+
+    def __init__(self, tpgol: TPGameOfLife, births: int, max_births: int,
+                 interval: float = 1.0, queue_size: int = 4,
+                 recorder: ReplayRecorder = None, notify=None) -> None:
+        """Create Simulation object.
+
+        tpgol       The TPGameOfLife to run, owned by the thread until stop
+        births      The number of births available to the player
+        max_births  The most births that can be regained
+        interval    Seconds between generations at speed 1
+        speed       Multiple of the normal speed, or None for unthrottled
+        paused      Whether ticking is paused
+        snapshots   The latest snapshots, oldest first; older ones are
+                    dropped when the game falls behind
+        recorder    A ReplayRecorder that every snapshot and placement is
+                    recorded with, from the thread
+        viewport    The cell at the bottom left of the snapshots' states
+        notify      A function called with no arguments after every snapshot,
+                    from the thread (or first from __init__)
+        """
+        self.tpgol = tpgol
+        self.births = births
+        self.max_births = max_births
+        self.interval = interval
+        self.speed = 1
+        self.paused = False
+        self.snapshots = deque(maxlen=queue_size)
+        self.generation = 0
+        self.placed = ()
+        self.win = None
+        self.recorder = recorder
+        self.viewport = (0, 0)
+        self.notify = notify
+        self._placements = []
+        self._stopped = False
+        self._scroll = (0, 0)  # Viewport moves not yet published
+        self._condition = threading.Condition()
+        self._publish()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _publish(self) -> None:
+        """Add a snapshot of the current generation."""
+        tpgol = self.tpgol
+        if self.viewport == (0, 0) and tpgol.engine.bounded:
+            states = grid = tpgol.states()
+            red = states.count(tpgol.RED)
+            green = states.count(tpgol.GREEN)
+        else:
+            states = tpgol.viewport(*self.viewport, tpgol.columns, tpgol.rows)
+            grid = states
+            if self.viewport != (0, 0) and self.recorder is not None:
+                grid = tpgol.states()
+            red = tpgol.population(tpgol.RED)
+            green = tpgol.population(tpgol.GREEN)
+        if not red and self.win is None:
+            self.win = self.generation
+        self.snapshots.append(Snapshot(
+            self.generation, states, self.births, red, green, self.placed,
+            self.win, self.viewport))
+        if self.recorder is not None:
+            self.recorder.record(self.generation, grid, self.births, red,
+                                 green)
+        if self.notify is not None:
+            self.notify()
+
+    def latest(self) -> Snapshot:
+        """Return the newest snapshot, or None if there is nothing new since
+        the last call.
+        """
+        snapshot = None
+        while self.snapshots:
+            snapshot = self.snapshots.popleft()
+        return snapshot
+
+    def place(self, generation: int, x: int, y: int) -> None:
+        """Queue a green cell to be placed at (x, y) at the given
+        generation.
+        """
+        with self._condition:
+            self._placements.append((generation, x, y))
+            self._condition.notify()
+
+    def set_speed(self, speed: int) -> None:
+        """Set the speed as a multiple of normal, or None for unthrottled."""
+        with self._condition:
+            self.speed = speed
+            self._condition.notify()
+
+    def scroll(self, x: int, y: int) -> None:
+        """Move the viewport by x columns and y rows and publish a snapshot
+        of it.
+        """
+        with self._condition:
+            self._scroll = (self._scroll[0] + x, self._scroll[1] + y)
+            self._condition.notify()
+
+    def toggle_pause(self) -> None:
+        """Pause ticking, or resume it if paused."""
+        with self._condition:
+            self.paused = not self.paused
+            self._condition.notify()
+
+    def stop(self) -> None:
+        """Stop the thread and wait for it to finish its current tick."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _place(self, placements: List[Tuple[int, int, int]]) -> List[Tuple[
+            int, int, int]]:
+        """Place the cells due by the current generation and return the
+        rest.
+        """
+        tpgol = self.tpgol
+        waiting = []
+        for generation, x, y in sorted(placements):
+            if generation > self.generation:
+                waiting.append((generation, x, y))
+            elif (self.births >= 1 and tpgol.contains(x, y) and
+                  tpgol.get_state(x, y) == tpgol.DEAD):
+                tpgol.set_state(x, y, tpgol.GREEN)
+                self.births -= 1
+                self.placed += ((self.generation, x, y),)
+                if self.recorder is not None:
+                    self.recorder.place(self.generation, x, y)
+        return waiting
+
+    def _run(self) -> None:
+        """Tick and apply placements until stopped."""
+        last = time.perf_counter()  # When the last tick was due
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopped:
+                        return
+                    if any(generation <= self.generation for generation, x, y
+                           in self._placements) or self._scroll != (0, 0):
+                        break
+                    timeout = None
+                    if not self.paused:
+                        if self.speed is None:
+                            break
+                        timeout = (last + self.interval/self.speed
+                                   - time.perf_counter())
+                        if timeout <= 0:
+                            break
+                    self._condition.wait(timeout)
+                placements = self._placements
+                self._placements = []
+                scroll = self._scroll
+                self._scroll = (0, 0)
+                interval = (self.interval / self.speed if self.speed
+                            else 0.0)
+                due = (not self.paused and
+                       last + interval <= time.perf_counter())
+
+            placed = len(self.placed)
+            waiting = self._place(placements)
+            with self._condition:
+                self._placements[:0] = waiting
+            if scroll != (0, 0):
+                self.viewport = (self.viewport[0] + scroll[0],
+                                 self.viewport[1] + scroll[1])
+            if len(self.placed) != placed or scroll != (0, 0):
+                self._publish()
+            if not due:
+                continue
+
+            if self.births < self.max_births:
+                self.births += 1
+            self.tpgol.tick()
+            self.generation += 1
+            self._publish()
+            time.sleep(0)  # Let the game take its turn at the interpreter
+            # Fall behind by at most one tick, so that a slow tick is not
+            # followed by a burst of them
+            last = max(last + interval, time.perf_counter() - interval)
 
 
 class Graphics:
@@ -125,21 +2813,61 @@ class Graphics:
     WHITE = (255, 255, 255)
     RED = (255, 0, 0)
     GREEN = (0, 255, 0)
+    BLUE = (0, 0, 255)
+    YELLOW = (255, 255, 0)
 
-    def __init__(self, resolution: Tuple[int, int]) -> None:
+    def __init__(self, resolution: Tuple[int, int],
+                 text_cache_size: int = 256) -> None:
         """Create a Graphics object.
         
-        screen      A pygame.Surface object representing the computer monitor
+        screen          A pygame.Surface object representing the computer
+                        monitor
+        text_cache_size The maximum number of rendered text surfaces kept
+        text_hits       The number of texts drawn from the cache
+        text_misses     The number of texts that had to be rendered
         """
         self.screen = pygame.display.set_mode(resolution)
         self.x_pixels = resolution[0]
         self.y_pixels = resolution[1]
+        self.text_cache_size = text_cache_size
+        self.text_hits = 0
+        self.text_misses = 0
+        self._fonts = {}
+        self._texts = OrderedDict()
+
+    def font(self, name: str, size: int) -> 'pygame.font.Font':
+        """Return the system font with the given name and size, creating it
+        only the first time it is asked for.
+        """
+        font = self._fonts.get((name, size))
+        if font is None:
+            font = self._fonts[(name, size)] = pygame.font.SysFont(name, size)
+        return font
+
+    def render_text(self, font: 'pygame.font.Font', word: str,
+                    colour: Tuple[int, int, int]) -> 'pygame.Surface':
+        """Return a surface with word rendered in font and colour.
 
-    def draw_text(self, font: pygame.font.Font, word: str, colour:
+        The most recently used surfaces are cached, so text that does not
+        change between frames is only rendered once.
+        """
+        key = (font, word, colour)
+        surface = self._texts.get(key)
+        if surface is not None:
+            self._texts.move_to_end(key)
+            self.text_hits += 1
+            return surface
+        self.text_misses += 1
+        surface = self._texts[key] = font.render(word, True, colour)
+        if len(self._texts) > self.text_cache_size:
+            self._texts.popitem(last=False)
+        return surface
+
+    def draw_text(self, font: 'pygame.font.Font', word: str, colour:
                   Tuple[int, int], x_frac: Tuple[int, int],
                   y_frac: Tuple[int, int], sub_x_pixels: int = None,
                   sub_y_pixels: int = None,
-                  sub_coordinates: Tuple[int, int] = [0, 0]) -> pygame.Rect:
+                  sub_coordinates: Tuple[int, int] = [0, 0]) -> 'pygame.Rect':
         """Draw text onto the screen and return the corresponding pygame.Rect.
 
         x_frac and y_frac are tuples where the first element is the numerator and
@@ -157,24 +2885,24 @@ class Graphics:
             x_pixels = self.x_pixels
             y_pixels = self.y_pixels
 
-        word_surface = font.render(word, True, colour)
-        x_coord = (((x_pixels/x_frac[1] - font.size(word)[0]) / 2)
+        word_surface = self.render_text(font, word, colour)
+        width, height = word_surface.get_size()
+        x_coord = (((x_pixels/x_frac[1] - width) / 2)
                    + ((x_frac[0]-1)/x_frac[1]) * x_pixels)
-        y_coord = (((y_pixels/y_frac[1] - font.size(word)[1]) / 2)
+        y_coord = (((y_pixels/y_frac[1] - height) / 2)
                    + ((y_frac[0]-1)/y_frac[1]) * y_pixels)
         self.screen.blit(word_surface, (x_coord+sub_coordinates[0],
                             y_coord+sub_coordinates[1]))
         return pygame.Rect((x_coord+sub_coordinates[0],
-                            y_coord+sub_coordinates[1]), (font.size(word)[0],
-                            font.size(word)[1]))
+                            y_coord+sub_coordinates[1]), (width, height))
 
-    def draw_main_menu(self) -> List[pygame.Rect]:
+    def draw_main_menu(self) -> List['pygame.Rect']:
         """Draw the main menu and return the pygame.Rect that represent the
         buttons, top to bottom.
         """
         self.screen.fill(self.BLACK)
-        title_font = pygame.font.SysFont('Arial', 100)
-        button_font = pygame.font.SysFont('Arial', 200)
+        title_font = self.font('Arial', 100)
+        button_font = self.font('Arial', 200)
         self.draw_text(title_font, 'Game of Life Game', self.WHITE, (1, 1),
                        (1, 3))
         levels_button = self.draw_text(button_font, 'LEVELS', self.WHITE,
@@ -183,16 +2911,26 @@ class Graphics:
                                      (3, 3))
         return (levels_button, quit_button)
 
-    def draw_level_select(self) -> None:
-        """Draw the level select menu."""
+    def draw_level_select(self, labels: List[str]) -> List['pygame.Rect']:
+        """Draw a page of the level select menu, with up to six labels in
+        two rows of three, and return the pygame.Rect of the sixth of the
+        screen around each label.
+        """
         self.screen.fill(self.BLACK)
-        level_font = pygame.font.SysFont('Arial', 400)
-        self.draw_text(level_font, '1', self.WHITE, (1, 3), (1, 2))
-        self.draw_text(level_font, '2', self.WHITE, (2, 3), (1, 2))
-        self.draw_text(level_font, '3', self.WHITE, (3, 3), (1, 2))
-        self.draw_text(level_font, '4', self.WHITE, (1, 3), (2, 2))
-        self.draw_text(level_font, '5', self.WHITE, (2, 3), (2, 2))
-        self.draw_text(level_font, '6', self.WHITE, (3, 3), (2, 2))
+        level_font = self.font('Arial', 400 if max(map(len, labels),
+                                                   default=1) < 2 else 200)
+        slots = []
+        for i, label in enumerate(labels):
+            self.draw_text(level_font, label, self.WHITE, (i%3 + 1, 3),
+                           (i//3 + 1, 2))
+            # Edges rounded up, so that every pixel is in exactly one slot
+            column, row = i % 3, i // 3
+            left = -(-column * self.x_pixels // 3)
+            top = -(-row * self.y_pixels // 2)
+            slots.append(pygame.Rect(
+                left, top, -(-(column+1) * self.x_pixels // 3) - left,
+                -(-(row+1) * self.y_pixels // 2) - top))
+        return slots
 
     def draw_grid(self) -> None:
         """Draw and empty grid onto the screen."""
@@ -219,26 +2957,278 @@ class Graphics:
         pygame.draw.rect(self.screen, colour, cell_rect)
 
 
+class BoardRenderer:
+    """Draws the cells of a TPGameOfLife onto the screen of a Graphics,
+    repainting only the cells that changed since the last frame.
+    """
+    # Repaint the whole board at once when more than this fraction of the
+    # visible cells changed
+    FULL_REDRAW = 0.25
+
+    def __init__(self, gr: Graphics, tpgol: TPGameOfLife) -> None:
+        """Create BoardRenderer object.
+
+        columns     The number of columns that fit on screen
+        rows        The number of rows that fit on screen, above the bar
+        shown       The states of the cells on screen, column by column, or
+                    None if nothing has been drawn yet
+        """
+        self.gr = gr
+        self.tpgol = tpgol
+        self.columns = min(tpgol.columns, gr.x_pixels // 20)
+        self.rows = min(tpgol.rows, (gr.y_pixels-40) // 20)
+        self.shown = None
+        # The colour of every state, with white for any without one
+        self.colours = ((gr.BLACK, gr.RED, gr.GREEN, gr.BLUE, gr.YELLOW)
+                        + (gr.WHITE,) * 251)
+        self.rect = pygame.Rect(0, 0, self.columns*20, self.rows*20)
+        # Grid lines, laid over the board after it is scaled up
+        self.lines = pygame.Surface(self.rect.size)
+        self.lines.set_colorkey(gr.BLACK)
+        for x in range(0, self.rect.width, 20):
+            pygame.draw.line(self.lines, gr.WHITE, (x, 0),
+                             (x, self.rect.height))
+        for y in range(0, self.rect.height, 20):
+            pygame.draw.line(self.lines, gr.WHITE, (0, y),
+                             (self.rect.width, y))
+
+    def _visible(self, states: bytes) -> bytes:
+        """Return the states of the cells on screen, column by column, out of
+        the states of all cells.
+        """
+        if self.rows == self.tpgol.rows:
+            return states[:self.columns*self.rows]
+        return b''.join(states[i:i+self.rows] for i in
+                        range(0, self.columns*self.tpgol.rows,
+                              self.tpgol.rows))
+
+    def _draw_all(self, states: bytes) -> None:
+        """Paint every cell on screen with one scaled blit."""
+        # One pixel per cell, transposed because states go column by column
+        board = pygame.image.frombuffer(states, (self.rows, self.columns),
+                                        'P')
+        board.set_palette(self.colours)
+        board = pygame.transform.flip(pygame.transform.rotate(board, -90),
+                                      True, False)
+        self.gr.screen.blit(pygame.transform.scale(board, self.rect.size),
+                            self.rect)
+        self.gr.screen.blit(self.lines, self.rect)
+
+    def draw(self, states: bytes = None) -> List['pygame.Rect']:
+        """Draw the cells that changed since the last call and return the
+        areas of the screen that need to be updated.
+
+        states      The states of all cells, as returned by
+                    TPGameOfLife.states, if not those of tpgol
+        """
+        if states is None:
+            states = self.tpgol.states()
+        states = self._visible(states)
+        shown = self.shown
+        self.shown = states
+        if shown == states:
+            return []
+
+        rows = self.rows
+        changed = []
+        if shown is not None:
+            for start in range(0, len(states), rows):
+                end = start + rows
+                if shown[start:end] != states[start:end]:
+                    changed.extend(i for i in range(start, end)
+                                   if shown[i] != states[i])
+        if shown is None or len(changed) > self.FULL_REDRAW * len(states):
+            self._draw_all(states)
+            return [self.rect]
+
+        rects = []
+        for i in changed:
+            x = i // rows * 20
+            y = i % rows * 20
+            self.gr.colour_cell(self.colours[states[i]], (x, y))
+            rects.append(pygame.Rect(x+1, y+1, 19, 19))
+        return rects
+
+
+class TerminalRenderer:
+    """Draws the cells of a board in a terminal with ANSI escape codes,
+    writing only the cells that changed since the last frame.
+
+    Cells are drawn with the characters of TPGameOfLife.print, coloured by
+    state. Every frame is built in one buffer and written to the stream at
+    once, with cursor moves to the runs of changed cells and colour codes
+    only where the state changes along a run.
+    """
+    # The characters and SGR colour codes of cells, by state
+    GLYPHS = TPGameOfLife.CHARACTERS.encode()
+    COLOURS = (b'2', b'31', b'32', b'34', b'33')
+    # Unchanged cells between two changed ones in a row are written over
+    # rather than skipped with a cursor move, if there are at most this many
+    GAP = 3
+    # The most frames per second drawn
+    MAX_FPS = 30
+
+    def __init__(self, columns: int, rows: int, stream=None) -> None:
+        """Create TerminalRenderer object.
+
+        columns     The number of columns drawn
+        rows        The number of rows drawn, with a status line below them
+        stream      The binary stream the frames are written to (default
+                    standard output)
+        shown       The rows of states on screen, top first, or None if
+                    nothing has been drawn yet
+        written     The number of bytes written for the last frame
+        """
+        self.columns = columns
+        self.rows = rows
+        self.stream = stream or sys.stdout.buffer
+        self.shown = None
+        self.written = 0
+        self._glyphs = bytes.maketrans(bytes(range(256)),
+                                       self.GLYPHS.ljust(256, b'?'))
+        self._colours = [b'\x1b[0;' + code + b'm' for code in self.COLOURS]
+        self._colours += [b'\x1b[0m'] * (256 - len(self._colours))
+
+    def reset(self) -> None:
+        """Draw the whole screen again in the next frame."""
+        self.shown = None
+
+    def _span(self, frame: List[bytes], line: bytes, text: bytes,
+              start: int, end: int, colour: int) -> int:
+        """Add the cells of line from start to end - 1 to frame, as their
+        characters in text, and return the state whose colour is set after
+        them, given that of colour before.
+        """
+        colours = self._colours
+        run = start
+        for x in range(start, end):
+            if line[x] != colour:
+                frame.append(text[run:x])
+                colour = line[x]
+                frame.append(colours[colour])
+                run = x
+        frame.append(text[run:end])
+        return colour
+
+    def draw(self, states: bytes, status: str = '') -> None:
+        """Draw a frame: the states of the cells, column by column as
+        returned by TPGameOfLife.viewport, and a status line below them.
+        """
+        rows = self.rows
+        # Every row on screen, top first, as one state per cell
+        lines = [states[y::rows] for y in reversed(range(rows))]
+        shown = self.shown
+        frame = []
+        colour = None  # The state whose colour is set
+        if shown is None:
+            frame.append(b'\x1b[?25l\x1b[H\x1b[2J')  # Hide cursor, clear
+            for row, line in enumerate(lines):
+                frame.append(b'\x1b[%d;1H' % (row+1))
+                colour = self._span(frame, line, line.translate(self._glyphs),
+                                    0, len(line), colour)
+        else:
+            for row, (line, old) in enumerate(zip(lines, shown)):
+                if line == old:
+                    continue
+                text = line.translate(self._glyphs)
+                changed = [x for x, (state, old_state) in
+                           enumerate(zip(line, old)) if state != old_state]
+                start = end = changed[0]
+                frame.append(b'\x1b[%d;%dH' % (row+1, start+1))
+                for x in changed[1:] + [None]:
+                    if x is not None and x - end - 1 <= self.GAP:
+                        end = x
+                        continue
+                    colour = self._span(frame, line, text, start, end+1,
+                                        colour)
+                    if x is not None:
+                        frame.append(b'\x1b[%dC' % (x - end - 1))
+                        start = end = x
+        frame.append(b'\x1b[%d;1H\x1b[0m' % (rows+1) + status.encode()
+                     + b'\x1b[K')
+        self.shown = lines
+
+        data = b''.join(frame)
+        self.written = len(data)
+        self.stream.write(data)
+        self.stream.flush()
+
+    def close(self) -> None:
+        """Reset the colour and show the cursor again, below the status
+        line.
+        """
+        self.stream.write(b'\x1b[0m\x1b[?25h\x1b[%d;1H\n' % (self.rows+1))
+        self.stream.flush()
+
+
 class GUI(ABC):
-    """A Graphical User Interface, with methods for taking in user input."""
+    """A Graphical User Interface, with methods for taking in user input.
+
+    Screens are drawn only when something changed: between frames, the
+    loops block on the event queue, so a static screen takes no CPU.
+    """
+    # The most frames per second presented while something is moving
+    MAX_FPS = 60
 
     def __init__(self, tpgol: TPGameOfLife, gr: Graphics):
         self.tpgol = tpgol
         self.gr = gr
         self.m1_ready = False
         self.m1_cancelled = False
+        self.mouse_buttons = (False, False, False)  # As of the last event
 
     @abstractmethod
     def start(self):
         """Start the GUI."""
         pass
 
-    def check_quit(self, event: pygame.event.EventType) -> None:
+    def check_quit(self, event: 'pygame.event.EventType') -> None:
         """Terminate program if event calls for it."""
         if (event.type == pygame.QUIT or
             event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
             sys.exit()
 
+    def wait_events(self, timeout: float = None
+                    ) -> List['pygame.event.EventType']:
+        """Return the pending events, first waiting up to timeout seconds
+        (or for as long as it takes, if None) for one to arrive.
+
+        Events that end the program are acted on here. Waiting with a
+        timeout needs pygame 2.0 or later.
+        """
+        if timeout is None:
+            events = [pygame.event.wait()]
+        elif timeout > 0:
+            # Rounded up, so that waking up early does not spin
+            events = [pygame.event.wait(int(timeout*1000) + 1)]
+        else:
+            events = []
+        events += pygame.event.get()
+        for event in events:
+            self.check_quit(event)
+        return [event for event in events if event.type != pygame.NOEVENT]
+
+    def clicks(self, events: List['pygame.event.EventType']
+               ) -> List[Tuple[int, int]]:
+        """Return where each M1 click completed by events was let go of, as
+        decided by m1_pressed.
+
+        The mouse buttons are followed through the button events rather
+        than polled, so that no click is missed however long the events
+        waited in the queue.
+        """
+        clicks = []
+        for event in events:
+            if (event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP)
+                    and event.button in (1, 3)):
+                buttons = list(self.mouse_buttons)
+                buttons[event.button - 1] = (event.type ==
+                                             pygame.MOUSEBUTTONDOWN)
+                self.mouse_buttons = tuple(buttons)
+                if self.m1_pressed(self.mouse_buttons):
+                    clicks.append(event.pos)
+        return clicks
+
     def m1_pressed(self, mouse_buttons: Tuple[int, int, int]) -> bool:
         """Return whether a M1 press has been succesfully completed.
 
@@ -269,70 +3259,68 @@ class MainMenu(GUI):
 
     def start(self):
         """Begin the main menu loop."""
-        button_rects = gr.draw_main_menu()
+        button_rects = self.gr.draw_main_menu()
         pygame.display.flip()
 
         while True:
-            events = pygame.event.get()
-            mouse_buttons = pygame.mouse.get_pressed()
-            for event in events:
-                self.check_quit(event)
-            if self.m1_pressed(mouse_buttons):
-                mouse_pos = pygame.mouse.get_pos()
+            for mouse_pos in self.clicks(self.wait_events()):
                 if button_rects[0].collidepoint(mouse_pos):
-                    ls = LevelSelect(tpgol, gr)
+                    ls = LevelSelect(self.tpgol, self.gr)
                     ls.start()
                 elif button_rects[1].collidepoint(mouse_pos):
                     sys.exit()
 
 
 class LevelSelect(GUI):
-    """A menu for selecting a level."""
+    """A menu for selecting a level, six to a page. The left and right arrow
+    keys turn the page.
+    """
+    PAGE_SIZE = 6
 
-    def __init__(self, tpgol: TPGameOfLife, gr: Graphics):
+    def __init__(self, tpgol: TPGameOfLife, gr: Graphics,
+                 index: 'LevelIndex' = None):
         super().__init__(tpgol, gr)
+        self.index = index or LevelIndex()
+        self.page = 0
 
     def start(self):
         """Begin the level select menu loop."""
         while True:
             level = None  # Level selected by user
-
-            self.gr.draw_level_select()
+            levels = self.index.levels
+            pages = max(1, -(-len(levels) // self.PAGE_SIZE))
+            self.page = min(self.page, pages-1)
+            first = self.page * self.PAGE_SIZE
+            shown = levels[first:first+self.PAGE_SIZE]
+
+            # The area of the screen that selects each level on the page
+            slots = self.gr.draw_level_select([str(number) for number in
+                                               range(first+1,
+                                                     first+len(shown)+1)])
             pygame.display.flip()
             pygame.display.flip()  # This is not a typo
 
             while True:
-                events = pygame.event.get()
-                mouse_buttons = pygame.mouse.get_pressed()
+                events = self.wait_events()
 
+                page = self.page
                 for event in events:
-                    self.check_quit(event)
-
-                if self.m1_pressed(mouse_buttons):
-                    mouse_pos = pygame.mouse.get_pos()
-                    x, y = mouse_pos[0], mouse_pos[1]
-                    x_pixels = pygame.display.Info().current_w
-                    y_pixels = pygame.display.Info().current_h
-                    if x in range(0, x_pixels//3) and y in range(0, y_pixels//2):
-                        level = 1
-                    elif (x in range(x_pixels//3, 2*x_pixels//3)
-                          and y in range(0, y_pixels//2)):
-                        level = 2
-                    elif (x in range(2*x_pixels//3, x_pixels)
-                          and y in range(0, y_pixels//2)):
-                        level = 3
-                    elif (x in range(0, x_pixels//3)
-                          and y in range(y_pixels//2, y_pixels)):
-                        level = 4
-                    elif (x in range(x_pixels//3, 2*x_pixels//3)
-                          and y in range(y_pixels//2, y_pixels)):
-                        level = 5
-                    elif (x in range(2*x_pixels//3, x_pixels)
-                          and y in range(y_pixels//2, y_pixels)):
-                        level = 6
+                    if event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_RIGHT:
+                            page = min(page+1, pages-1)
+                        elif event.key == pygame.K_LEFT:
+                            page = max(page-1, 0)
+                if page != self.page:
+                    self.page = page
+                    break
+
+                for mouse_pos in self.clicks(events):
+                    for slot, rect in enumerate(slots):
+                        if rect.collidepoint(mouse_pos):
+                            level = shown[slot]
 
                 if level:
-                    g = Game(tpgol, gr)
+                    g = Game(self.tpgol, self.gr)
                     g.start(level)
                     break
 
@@ -340,173 +3328,292 @@ class LevelSelect(GUI):
 class Game(GUI):
     """A gamified, graphical implementation of TPGameOfLife."""
 
-    def __init__(self, tpgol: TPGameOfLife, gr: Graphics) -> None:
-        """Create Graphics object."""
+    def __init__(self, tpgol: TPGameOfLife, gr: Graphics,
+                 replays: str = REPLAYS_DIR) -> None:
+        """Create Graphics object.
+
+        replays     The directory games are recorded into, or None to not
+                    record them
+        """
         super().__init__(tpgol, gr)
         self.tpgol = tpgol
         self.gr = gr
-
-    def apply_level(self, level: int) -> None:
-        # X and Y values of centre or pseudo-center cell
-        cx = self.tpgol.columns // 2
-        cy = self.tpgol.rows // 2
-        # Max X and Y values
-        mx = self.tpgol.columns
-        my = self.tpgol.rows
-        for column in range(self.tpgol.columns):
-            for row in range(self.tpgol.rows):
-                self.tpgol.grid[column][row].state = self.tpgol.DEAD
-                self.tpgol.grid[column][row].next_state = self.tpgol.DEAD
-
-        if level == 1:  # Glider
-            self.starting_births = 8
-            self.max_births = 8
-            tpgol.modify_cells(tpgol.RED, [(1, 0), (2, 1), (0, 2), (1, 2),
-                               (2, 2)])
-        elif level == 2:  # R-pentomino
-            self.starting_births = 0
-            self.max_births = 5
-            tpgol.modify_cells(tpgol.RED, [(cx, cy), (cx, cy-1), (cx+1, cy-1),
-                               (cx-1, cy), (cx, cy+1)])
-        elif level == 3:  # Pulsar
-            self.starting_births = 3
-            self.max_births = 3
-            tpgol.modify_cells(tpgol.RED, [(cx-2, cy-2), (cx-2, cy-1),
-                               (cx-2, cy), (cx-2, cy+1), (cx-2, cy+2),
-                               (cx+2, cy-2), (cx+2, cy-1), (cx+2, cy),
-                               (cx+2, cy+1), (cx+2, cy+2), (cx, cy+2),
-                               (cx, cy-2)])
-        elif level == 4:  # Thunderbird
-            self.starting_births = 0
-            self.max_births = 5
-            x1 = self.tpgol.columns // 4
-            x2 = 3 * self.tpgol.columns // 4
-            tpgol.modify_cells(tpgol.RED, [(x1-1, cy-3), (x1, cy-3),
-                               (x1+1, cy-3), (x1, cy-1), (x1, cy), (x1, cy+1),
-                               (x2-1, cy-3), (x2, cy-3), (x2+1, cy-3),
-                               (x2, cy-1), (x2, cy), (x2, cy+1)])
-        elif level == 5:  # Pentadecathlon
-            self.starting_births = 10
-            self.max_births = 3
-            tpgol.modify_cells(tpgol.RED, [(cx-5, 5), (cx-4, 5), (cx-3, 5),
-                               (cx-2, 5), (cx-1, 5), (cx, 5), (cx+1, 5),
-                               (cx+2, 5), (cx+3, 5), (cx+4, 5), (cx-5, my-6),
-                               (cx-4, my-6), (cx-3, my-6), (cx-2, my-6),
-                               (cx-1, my-6), (cx, my-6), (cx+1, my-6),
-                               (cx+2, my-6), (cx+3, my-6), (cx+4, my-6),
-                               (5, cy-5), (5, cy-4), (5, cy-3), (5, cy-2),
-                               (5, cy-1), (5, cy), (5, cy+1), (5, cy+2),
-                               (5, cy+3), (5, cy+4), (mx-6, cy-5), (mx-6,cy-4),
-                               (mx-6, cy-3), (mx-6, cy-2), (mx-6, cy-1),
-                               (mx-6, cy), (mx-6, cy+1), (mx-6, cy+2),
-                               (mx-6, cy+3), (mx-6, cy+4)])
-        elif level == 6:  # Pi-heptomino
-            self.starting_births = 3
-            self.max_births = 2
-            tpgol.modify_cells(tpgol.RED, [(4, cy-1), (5, cy-1), (6, cy-1),
-                               (6, cy), (4, cy+1), (5, cy+1), (6, cy+1),
-                               (mx-7, cy-1), (mx-6, cy-1), (mx-5, cy-1),
-                               (mx-7, cy), (mx-7, cy+1), (mx-6, cy+1),
-                               (mx-5, cy+1), (cx-1, 6), (cx, 6), (cx+1, 6),
-                               (cx-1, 5), (cx+1, 5), (cx-1, 4), (cx+1, 4),
-                               (cx-1, my-7), (cx, my-7), (cx+1, my-7),
-                               (cx-1, my-6), (cx+1, my-6), (cx-1, my-5),
-                               (cx+1, my-5)])
-
-    def start(self, level) -> None:
-        """Begin the main game loop."""
-        self.gr.draw_grid()
-        self.gr.draw_bar()
+        self.replays = replays
+
+    def apply_level(self, level: LevelInfo) -> None:
+        """Set up the grid and births for a level."""
+        load_level(self.tpgol, level)
+        self.starting_births = level.starting_births
+        self.max_births = level.max_births
+
+    def draw_status(self, births: int, generation: int, win: bool) -> None:
+        """Draw the status bar with the births available and generation."""
+        gr = self.gr
+        status_font = gr.font('Arial', 20)
+        gr.draw_bar()
+        gr.draw_text(status_font, 'Availible Births: ' + str(births),
+                     gr.WHITE, (2, 3), ((gr.y_pixels-1)//40, gr.y_pixels//40))
+        gr.draw_text(status_font, 'Back', gr.WHITE, (1, 3),
+                     ((gr.y_pixels-1)//40, gr.y_pixels//40))
+        gr.draw_text(status_font, 'Generation: ' + str(generation),
+                     gr.GREEN if win else gr.WHITE, (3, 3),
+                     ((gr.y_pixels-1)//40, gr.y_pixels//40))
+
+    def back_pressed(self, mouse_pos: Tuple[int, int]) -> bool:
+        """Return whether mouse_pos is on the back button."""
+        return (0 <= mouse_pos[0] < self.gr.x_pixels//3 and
+                self.gr.y_pixels-40 <= mouse_pos[1] < self.gr.y_pixels)
+
+    def start(self, level: LevelInfo) -> None:
+        """Begin the main game loop.
+
+        The board is ticked by a Simulation on a background thread, which
+        wakes the loop up with an event when it has a new snapshot. The
+        latest snapshot is then drawn, at most MAX_FPS times per second,
+        and less often if frames take long to draw; with nothing new to
+        draw, the loop sleeps until the next event. Space pauses, and keys
+        1 to 4 set the speed to 1x, 10x, 100x and as fast as possible. The
+        arrow keys scroll the board if the engine's universe goes past the
+        grid. The game is recorded into the replays directory.
+        """
+        gr = self.gr
+        tpgol = self.tpgol
+        gr.draw_grid()
+        gr.draw_bar()
+        pygame.display.flip()
+        renderer = BoardRenderer(gr, tpgol)
+        bar_rect = pygame.Rect(0, gr.y_pixels-40, gr.x_pixels, 40)
 
         generation = 0
-        status_font = pygame.font.SysFont('Arial', 20)
-        back = False
-        red_on_board = False
         win = False
+        shown_bar = None  # What the status bar last showed
 
-        pause = False  # Pause GOL ticks or not
-        clock = pygame.time.Clock()  # Clock for managing framerate
-        GOLTICK = pygame.USEREVENT  # Event indicating to update GOL board
         FREQUENCY = 1000  # How often to update GOL board, in milliseconds
-
-        pygame.time.set_timer(GOLTICK, FREQUENCY)
+        SPEED_KEYS = {pygame.K_1: 0, pygame.K_2: 1, pygame.K_3: 2,
+                      pygame.K_4: 3}  # Index into Simulation.SPEEDS
+        # Viewport moves, for engines whose universe goes past the grid
+        SCROLL_KEYS = {pygame.K_LEFT: (-5, 0), pygame.K_RIGHT: (5, 0),
+                       pygame.K_UP: (0, -5), pygame.K_DOWN: (0, 5)}
+        SNAPSHOT = pygame.USEREVENT  # Posted when there is a new snapshot
+        # Set while a snapshot is waiting to be drawn, so that at most one
+        # SNAPSHOT event is posted per frame however fast the board ticks
+        pending = threading.Event()
+
+        def notify() -> None:
+            """Wake the loop up for a new snapshot."""
+            if not pending.is_set():
+                pending.set()
+                pygame.event.post(pygame.event.Event(SNAPSHOT))
 
         self.apply_level(level)
+        # A fresh seed for every game, so that the replay can reproduce it
+        tpgol.reseed(new_seed())
+        recorder = None
+        if self.replays is not None:
+            os.makedirs(self.replays, exist_ok=True)
+            recorder = ReplayRecorder(
+                os.path.join(self.replays, '{}-{}.golr'.format(
+                    time.strftime('%Y%m%d-%H%M%S'),
+                    os.path.splitext(os.path.basename(level.path))[0])),
+                tpgol, self.starting_births, self.max_births)
+        simulation = Simulation(tpgol, self.starting_births, self.max_births,
+                                FREQUENCY / 1000, recorder=recorder,
+                                notify=notify)
+        # The first snapshot, which is left for the first frame to draw
+        snapshot = simulation.snapshots[-1]
+        next_frame = time.perf_counter()  # When a frame may next be shown
+
+        try:
+            while True:
+                # Wait for input, or for the next frame if there is a
+                # snapshot to draw
+                events = self.wait_events(
+                    next_frame - time.perf_counter() if pending.is_set()
+                    else None)
+
+                for event in events:
+                    if event.type == pygame.KEYDOWN:  # Key presses
+                        if event.key == pygame.K_SPACE:  # Pause game
+                            simulation.toggle_pause()
+                        elif event.key in SPEED_KEYS:  # Fast forward
+                            simulation.set_speed(
+                                Simulation.SPEEDS[SPEED_KEYS[event.key]])
+                        elif (event.key in SCROLL_KEYS and
+                              not tpgol.engine.bounded):
+                            simulation.scroll(*SCROLL_KEYS[event.key])
+
+                back = False
+                for mouse_pos in self.clicks(events):
+                    coordinates = (mouse_pos[0]//20, mouse_pos[1]//20)
+                    if (snapshot.births >= 1 and
+                       (coordinates[0] < renderer.columns and
+                        coordinates[1] < renderer.rows) and not win):
+                        if (snapshot.states[coordinates[0]*tpgol.rows
+                                            + coordinates[1]] == tpgol.DEAD):
+                            simulation.place(
+                                snapshot.generation,
+                                snapshot.viewport[0] + coordinates[0],
+                                snapshot.viewport[1] + coordinates[1])
+                    elif self.back_pressed(mouse_pos):
+                        back = True
+                if back:
+                    break
+
+                now = time.perf_counter()
+                if not pending.is_set() or now < next_frame:
+                    continue  # Nothing to draw yet
+                pending.clear()
+                latest = simulation.latest()
+                if latest is None:
+                    continue
+                snapshot = latest
+                rects = renderer.draw(snapshot.states)
+                # Ticks go on after a win, but the generation shown stops
+                win = snapshot.win is not None
+                generation = snapshot.win if win else snapshot.generation
+
+                bar = (snapshot.births, generation, win)
+                if bar != shown_bar:  # Redraw status bar only when it changes
+                    shown_bar = bar
+                    rects.append(bar_rect)
+                    self.draw_status(*bar)
+
+                if rects:
+                    pygame.display.update(rects)
+                    # Frames that are slow to draw are spaced out, so that
+                    # drawing takes at most half of the time
+                    next_frame = now + max(1 / self.MAX_FPS,
+                                           2 * (time.perf_counter() - now))
+        finally:
+            simulation.stop()
+            if recorder is not None:
+                recorder.close()
+
+    def replay(self, reader: ReplayReader) -> None:
+        """Play back a recorded game.
+
+        Space pauses, keys 1 to 4 set the speed like in the game, and the
+        left and right arrow keys jump 10 generations back and forward.
+        Frames are paced like in the game, and the loop sleeps while paused
+        or at the end of the replay.
+        """
+        gr = self.gr
+        gr.draw_grid()
+        gr.draw_bar()
+        pygame.display.flip()
+        renderer = BoardRenderer(gr, self.tpgol)
+        bar_rect = pygame.Rect(0, gr.y_pixels-40, gr.x_pixels, 40)
+        shown_bar = None  # What the status bar last showed
+
+        SPEED_KEYS = {pygame.K_1: 0, pygame.K_2: 1, pygame.K_3: 2,
+                      pygame.K_4: 3}  # Index into Simulation.SPEEDS
+        speed = 1
+        paused = False
+        target = 0.0  # The generation that should be shown by now
+        frames = reader.frames(0)
+        snapshot = next(frames)
+        upcoming = next(frames, None)  # The frame after snapshot
+        rects = renderer.draw(snapshot.states)
+        last = time.perf_counter()
+        next_frame = last  # When a frame may next be shown
 
         while True:
-            events = pygame.event.get()
-            mouse_buttons = pygame.mouse.get_pressed()
+            # Wait for input, or until the next frame is due
+            wake = None
+            if not paused and upcoming is not None:
+                wake = next_frame
+                if speed is not None:
+                    wake = max(wake, last + (upcoming.generation - target)
+                               / speed)
+            events = self.wait_events(None if wake is None
+                                      else wake - time.perf_counter())
+            now = time.perf_counter()
+            if not paused:
+                target = (float('inf') if speed is None
+                          else target + (now-last)*speed)
+            last = now
 
             for event in events:
-                self.check_quit(event)
-                if event.type == pygame.KEYDOWN:  # Key presses
-                    if event.key == pygame.K_SPACE:  # Pause game
-                        pause = not pause
-                elif event.type == GOLTICK and not pause:  # Update GOL board
-                    if self.starting_births < self.max_births:
-                        self.starting_births += 1
-                    tpgol.tick()
-                    if not win:
-                        generation += 1
-
-            if self.m1_pressed(mouse_buttons):
-                mouse_pos = pygame.mouse.get_pos()
-                coordinates = (mouse_pos[0]//20, mouse_pos[1]//20)
-                if (self.starting_births >= 1 and
-                   (coordinates[0] < len(tpgol.grid) and
-                    coordinates[1] < len(tpgol.grid[0])) and not win):
-                    if (tpgol.grid[coordinates[0]][coordinates[1]].state ==
-                        tpgol.DEAD):
-                            tpgol.grid[coordinates[0]]\
-                                      [coordinates[1]].state = tpgol.GREEN
-                            self.starting_births -= 1
-                # Back button
-                elif (mouse_pos[0] in range(0, gr.x_pixels//3) and
-                      mouse_pos[1] in range(gr.y_pixels-40, gr.y_pixels)):
-                    break
-                m1_ready = False
-
-
-            # Update colours of all cells
-            for x in range(tpgol.columns):
-                for y in range(tpgol.rows):
-                    state = tpgol.grid[x][y].state
-                    if state == tpgol.DEAD:
-                        colour = gr.BLACK
-                    elif state == tpgol.RED:
-                        colour = gr.RED
-                        red_on_board = True
-                    elif state == tpgol.GREEN:
-                        colour = gr.GREEN
-                    gr.colour_cell(colour, (x*20, y*20))
-
-            if not red_on_board:
-                win = True
-            else:
-                red_on_board = False
-
-            self.gr.draw_bar()
-            self.gr.draw_text(status_font, 'Availible Births: '
-                               + str(self.starting_births),
-                               self.gr.WHITE, (2, 3), ((gr.y_pixels-1)//40,
-                               gr.y_pixels//40))
-            self.gr.draw_text(status_font, 'Back', self.gr.WHITE, (1, 3),
-                              ((gr.y_pixels-1)//40, gr.y_pixels//40))
-            if win:
-                self.gr.draw_text(status_font, 'Generation: '
-                                  + str(generation), self.gr.GREEN, (3, 3),
-                                  ((gr.y_pixels-1)//40, gr.y_pixels//40))
-            else:
-                self.gr.draw_text(status_font, 'Generation: '
-                                  + str(generation), self.gr.WHITE, (3, 3),
-                                  ((gr.y_pixels-1)//40, gr.y_pixels//40))
-
-            clock.tick(60)
-            pygame.display.flip()
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_SPACE:
+                        paused = not paused
+                    elif event.key in SPEED_KEYS:
+                        speed = Simulation.SPEEDS[SPEED_KEYS[event.key]]
+                    elif event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                        step = 10 if event.key == pygame.K_RIGHT else -10
+                        target = max(0, snapshot.generation + step)
+                        frames = reader.frames(target)
+                        snapshot = next(frames)
+                        upcoming = next(frames, None)
+                        rects += renderer.draw(snapshot.states)
+            if any(self.back_pressed(mouse_pos) for mouse_pos in
+                   self.clicks(events)):
+                break
+
+            if not paused and now >= next_frame:
+                # Catch up with target, but only for as long as a frame lasts
+                while upcoming is not None and upcoming.generation <= target:
+                    snapshot = upcoming
+                    upcoming = next(frames, None)
+                    if time.perf_counter() - now > 1 / self.MAX_FPS:
+                        break
+                target = min(target, snapshot.generation + 1)
+                rects += renderer.draw(snapshot.states)
+
+            win = snapshot.win is not None
+            bar = (snapshot.births,
+                   snapshot.win if win else snapshot.generation, win)
+            if bar != shown_bar:  # Redraw status bar only when it changes
+                shown_bar = bar
+                rects.append(bar_rect)
+                self.draw_status(*bar)
+
+            if rects:
+                pygame.display.update(rects)
+                next_frame = now + max(1 / self.MAX_FPS,
+                                       2 * (time.perf_counter() - now))
+            rects = []
 
 
 if __name__ == '__main__':
-    tpgol = TPGameOfLife(51, 39)
+    import argparse
+    parser = argparse.ArgumentParser(description='Game of Life Game')
+    parser.add_argument('replay', nargs='?', help='replay file to play back')
+    parser.add_argument('--engine', choices=list(ENGINES), default='python',
+                        help='engine to play with')
+    parser.add_argument('--topology', choices=SparseEngine.TOPOLOGIES,
+                        help='universe of the sparse engine')
+    parser.add_argument('--text', action='store_true',
+                        help='run a level in the terminal, until it repeats '
+                             'itself, instead of playing it')
+    parser.add_argument('--level', type=int, default=1,
+                        help='level to run with --text')
+    parser.add_argument('--rate', type=float, default=2.0,
+                        help='generations per second with --text (0 for as '
+                             'fast as possible)')
+    parser.add_argument('--viewport', default='0,0',
+                        help='cell at the bottom left of the terminal with '
+                             '--text, as X,Y')
+    args = parser.parse_args()
+    options = {'topology': args.topology} if args.topology else {}
+    if args.text:  # Run a level without graphics
+        info = LevelIndex().level(args.level)
+        tpgol = TPGameOfLife(info.columns, info.rows, args.engine, **options)
+        load_level(tpgol, info)
+        try:
+            tpgol.start(args.rate or None,
+                        tuple(int(n) for n in args.viewport.split(',')))
+        except KeyboardInterrupt:
+            pass
+        tpgol.close()
+        sys.exit()
+    if args.replay:  # Play back the replay file given
+        reader = ReplayReader(args.replay)
+        tpgol = TPGameOfLife(reader.columns, reader.rows)
+        gr = Graphics((1021, 821))
+        Game(tpgol, gr, replays=None).replay(reader)
+        sys.exit()
+    tpgol = TPGameOfLife(51, 39, args.engine, **options)
     gr = Graphics((1021, 821))
     m = MainMenu(tpgol, gr)
     m.start()
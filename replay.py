@@ -0,0 +1,108 @@
+"""Play back, inspect and check recorded games without graphics.
+
+Usage:
+    python replay.py FILE [--generation N] [--play] [--interval SECONDS]
+                          [--verify]
+
+Prints a summary of the replay, then the board at --generation (in the
+format of TPGameOfLife.print), every frame from there with --play, and
+with --verify re-simulates the game from its seed and placements and
+reports the first generation whose cells or populations differ from the
+recording, if any.
+"""
+import argparse
+import sys
+import time
+from typing import Optional
+
+from golg import ReplayReader, Snapshot, TPGameOfLife
+
+
+# The characters of TPGameOfLife.print, by state byte
+CHARS = bytes.maketrans(bytes(range(256)),
+                        TPGameOfLife.CHARACTERS.encode().ljust(256, b'?'))
+
+
+def format_board(snapshot: Snapshot, columns: int, rows: int) -> str:
+    """Return the board of a snapshot drawn like TPGameOfLife.print."""
+    states = snapshot.states[:columns*rows]
+    return '\n'.join(states[y::rows].translate(CHARS).decode()
+                     for y in reversed(range(rows)))
+
+
+def verify(reader: ReplayReader) -> Optional[int]:
+    """Replay the recorded game from its first frame, seed and placements,
+    and return the first generation whose board or populations differ from
+    the recording, or None if they all match.
+    """
+    if reader.seed is None:
+        raise ValueError('The replay has no seed to reproduce it with')
+    tpgol = reader.start()
+    generation = 0
+    applied = 0  # The number of placements made so far
+    try:
+        for snapshot in reader.frames(0):
+            while generation < snapshot.generation:
+                tpgol.tick()
+                generation += 1
+            # Placements are recorded before the frame that shows them
+            for placed_generation, x, y in snapshot.placed[applied:]:
+                tpgol.set_state(x, y, tpgol.GREEN)
+            applied = len(snapshot.placed)
+            if (tpgol.states() != snapshot.states or
+                    tpgol.population(tpgol.RED) != snapshot.red or
+                    tpgol.population(tpgol.GREEN) != snapshot.green):
+                return snapshot.generation
+    finally:
+        tpgol.close()
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('file', help='replay file to read')
+    parser.add_argument('--generation', type=int, default=None,
+                        help='print the board at this generation')
+    parser.add_argument('--play', action='store_true',
+                        help='print every frame from --generation on')
+    parser.add_argument('--interval', type=float, default=0.0,
+                        help='seconds between frames with --play')
+    parser.add_argument('--verify', action='store_true',
+                        help='check that the game reproduces exactly')
+    args = parser.parse_args()
+
+    reader = ReplayReader(args.file)
+    engine = ' '.join([reader.engine] + ['{}={}'.format(*option) for option
+                                         in sorted(reader.options.items())])
+    print('{}x{} {} engine, {} rule, seed {}, births {}/{}, {} generations, '
+          '{} placements, win {}'.format(
+              reader.columns, reader.rows, engine, reader.rule, reader.seed,
+              reader.starting_births, reader.max_births, reader.generations,
+              len(reader.placements), reader.win))
+
+    if args.play:
+        for snapshot in reader.frames(args.generation or 0):
+            print()
+            print('Generation {}, births {}'.format(snapshot.generation,
+                                                    snapshot.births))
+            print(format_board(snapshot, reader.columns, reader.rows))
+            sys.stdout.flush()
+            time.sleep(args.interval)
+    elif args.generation is not None:
+        snapshot = reader.seek(args.generation)
+        print('Generation {}, births {}'.format(snapshot.generation,
+                                                snapshot.births))
+        print(format_board(snapshot, reader.columns, reader.rows))
+
+    if args.verify:
+        differs = verify(reader)
+        if differs is None:
+            print('Reproduced exactly')
+        else:
+            print('Differs from generation {}'.format(differs))
+            sys.exit(1)
+    reader.close()
+
+
+if __name__ == '__main__':
+    main()
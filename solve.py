@@ -0,0 +1,235 @@
+"""Search for green placements that win levels in as few generations as
+possible.
+
+Usage:
+    python solve.py [--level N|FILE ...] [--engine NAME] [--seed N]
+                    [--seconds S] [--workers N ...] [--generations N]
+                    [--radius N] [--table-size N] [--format json|text]
+
+Each level is searched for the given number of seconds by a pool of
+worker processes. Every worker plays randomized rollouts from the
+starting board under the game's birth budget: one birth is regained
+(up to max_births) every generation, and a placement needs a birth and a
+dead cell. Placements are only tried within radius cells of a live red
+cell. Rollouts either start afresh or follow the best moves found so far
+up to a random generation and then diverge; the best result is shared
+between workers every round. A bounded transposition table per worker,
+keyed by the hash of the board and births, abandons rollouts that reach
+a position later than it was reached before.
+
+With several --workers values every level is searched once per value,
+to show how throughput scales.
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from batch import run
+from golg import (ENGINES, LevelIndex, LevelInfo, TPGameOfLife, load_level,
+                  read_level_info)
+
+
+def candidates(states: bytes, columns: int, rows: int,
+               radius: int) -> List[Tuple[int, int]]:
+    """Return the dead cells within radius cells (in both x and y) of a live
+    red cell.
+    """
+    cells = set()
+    i = states.find(TPGameOfLife.RED)
+    while i != -1:
+        x, y = divmod(i, rows)
+        for n_x in range(max(0, x-radius), min(columns, x+radius+1)):
+            for n_y in range(max(0, y-radius), min(rows, y+radius+1)):
+                cells.add((n_x, n_y))
+        i = states.find(TPGameOfLife.RED, i+1)
+    return sorted((x, y) for x, y in cells
+                  if states[x*rows + y] == TPGameOfLife.DEAD)
+
+
+def _search(task: Tuple) -> Dict[str, object]:
+    """Play rollouts for a number of seconds, in a worker process, and
+    return the best win found and how much work was done.
+    """
+    (path, engine, seed, rollout_seed, seconds, generations, radius,
+     table_size, best_win, best_moves) = task
+    level = read_level_info(path)
+    tpgol = TPGameOfLife(level.columns, level.rows, engine, seed)
+    load_level(tpgol, level)
+    start_states = tpgol.states()
+    rng = random.Random(rollout_seed)
+    table = OrderedDict()  # hash((states, births)) -> earliest generation
+    rollouts = 0
+    ticks = 0
+    pruned = 0
+
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        tpgol.set_states(start_states)
+        tpgol.reseed(seed)
+        rollouts += 1
+        # Follow the best moves up to a random generation, then improvise
+        follow = rng.randrange(best_win) if best_moves else -1
+        eagerness = rng.uniform(0.2, 1.0)
+        horizon = generations if best_win is None else best_win - 1
+        births = level.starting_births
+        moves = []
+        generation = 0
+        while True:
+            states = tpgol.states()
+            if generation <= follow:
+                for move in best_moves:
+                    if move[0] == generation:
+                        tpgol.set_state(move[1], move[2], tpgol.GREEN)
+                        births -= 1
+                        moves.append(move)
+            elif births >= 1 and rng.random() < eagerness:
+                options = candidates(states, tpgol.columns, tpgol.rows,
+                                     radius)
+                while births >= 1 and options:
+                    x, y = options.pop(rng.randrange(len(options)))
+                    tpgol.set_state(x, y, tpgol.GREEN)
+                    births -= 1
+                    moves.append((generation, x, y))
+                    if rng.random() >= eagerness:
+                        break
+            if moves and moves[-1][0] == generation:
+                states = tpgol.states()
+
+            if states.find(TPGameOfLife.RED) == -1:
+                best_win, best_moves = generation, moves
+                break
+            if generation >= horizon:
+                break
+            key = hash((states, births))
+            seen = table.get(key)
+            if seen is not None and seen < generation:
+                pruned += 1
+                break
+            table[key] = generation
+            table.move_to_end(key)
+            if len(table) > table_size:
+                table.popitem(last=False)
+
+            if births < level.max_births:
+                births += 1
+            tpgol.tick()
+            ticks += 1
+            generation += 1
+    tpgol.close()
+    return {'win': best_win, 'moves': best_moves, 'rollouts': rollouts,
+            'ticks': ticks, 'pruned': pruned}
+
+
+def solve(level: LevelInfo, engine: str, seed: int, seconds: float,
+          workers: int, generations: int = 500, radius: int = 2,
+          table_size: int = 1 << 16, rounds: int = 5) -> Dict[str, object]:
+    """Search for the fewest-generation win of a level with a pool of
+    workers and return the best found, with throughput statistics.
+
+    The time budget is split into rounds, and the best moves found in a
+    round are handed to every worker in the next.
+    """
+    best_win = None
+    best_moves = []
+    rollouts = 0
+    ticks = 0
+    pruned = 0
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        for round_ in range(rounds):
+            tasks = [(level.path, engine, seed,
+                      '{}-{}-{}'.format(seed, round_, worker),
+                      seconds / rounds, generations,
+                      radius, table_size, best_win, best_moves)
+                     for worker in range(workers)]
+            for found in pool.map(_search, tasks):
+                rollouts += found['rollouts']
+                ticks += found['ticks']
+                pruned += found['pruned']
+                if found['win'] is not None and (
+                        best_win is None or found['win'] < best_win):
+                    best_win, best_moves = found['win'], found['moves']
+    elapsed = time.perf_counter() - start
+
+    # Play the moves back as batch.py would, to check the result
+    tpgol = TPGameOfLife(level.columns, level.rows, engine, seed)
+    load_level(tpgol, level)
+    check = run(tpgol, level.starting_births, level.max_births,
+                best_win if best_win is not None else 0, best_moves)
+    tpgol.close()
+
+    return {
+        'level': level.name,
+        'engine': engine,
+        'seed': seed,
+        'workers': workers,
+        'win': best_win,
+        'moves': best_moves,
+        'verified': best_win is not None and check['win'] == best_win,
+        'rollouts': rollouts,
+        'pruned': pruned,
+        'seconds': round(elapsed, 3),
+        'rollouts_per_second': round(rollouts / elapsed, 1),
+        'ticks_per_second': round(ticks / elapsed, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--level', action='append',
+                        help='built-in level number or level file to solve '
+                             '(repeatable, default all built-in levels)')
+    # The parallel engine's own pool cannot run inside a worker
+    parser.add_argument('--engine', choices=[engine for engine in ENGINES
+                                             if engine != 'parallel'],
+                        default='bitplane',
+                        help='engine to play rollouts with')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='coin flip seed the levels are played with')
+    parser.add_argument('--seconds', type=float, default=10.0,
+                        help='time budget per level and --workers value')
+    parser.add_argument('--workers', action='append', type=int,
+                        help='number of worker processes (repeatable, '
+                             'default one per CPU)')
+    parser.add_argument('--generations', type=int, default=500,
+                        help='longest rollout until a win is found')
+    parser.add_argument('--radius', type=int, default=2,
+                        help='only place cells this close to a red cell')
+    parser.add_argument('--table-size', type=int, default=1 << 16,
+                        help='transposition table entries per worker')
+    parser.add_argument('--format', choices=['json', 'text'], default='text',
+                        help='output JSON lines or text')
+    args = parser.parse_args()
+
+    index = LevelIndex()
+    levels = args.level or [str(number) for number in
+                            range(1, len(index)+1)]
+    for level in levels:
+        if level.isdigit():
+            info = index.level(int(level))
+        else:
+            info = read_level_info(level)
+        for workers in args.workers or [multiprocessing.cpu_count()]:
+            found = solve(info, args.engine, args.seed, args.seconds,
+                          workers, args.generations, args.radius,
+                          args.table_size)
+            if args.format == 'json':
+                print(json.dumps(found))
+            else:
+                print('{level}: win {win} ({verified}) with {workers} '
+                      'workers, {rollouts_per_second} rollouts/s, '
+                      '{ticks_per_second} ticks/s'.format(
+                          **dict(found, verified='verified' if
+                                 found['verified'] else 'not verified')))
+                print('    moves: ' + ' '.join(
+                    '{}:{},{}'.format(*move) for move in found['moves']))
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
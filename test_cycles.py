@@ -0,0 +1,105 @@
+"""Check that CycleDetector finds still lifes and cycles on every engine, and
+that batch.run, which cuts runs short once they cycle, ends where running
+every generation does.
+
+Run with:
+    python -m unittest test_cycles
+"""
+import unittest
+
+from batch import run
+from golg import ENGINES, CycleDetector, TPGameOfLife
+from test_rules import soup
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEAD = TPGameOfLife.DEAD
+RED = TPGameOfLife.RED
+GREEN = TPGameOfLife.GREEN
+
+
+def engines():
+    """Return (engine, options) for every engine that can run here, with
+    sparse bounded like the others.
+    """
+    return [(engine, {'topology': 'bounded'} if engine == 'sparse' else {})
+            for engine in ENGINES if engine != 'numpy' or np is not None]
+
+
+class CycleDetectorTest(unittest.TestCase):
+    """Still lifes, oscillators and soups on every engine."""
+    columns = 23
+    rows = 17
+
+    def detect(self, engine: str, cells, ticks: int, **options):
+        """Return the cycles found by a CycleDetector after each of the
+        given number of ticks of a board with the given (x, y, state) cells.
+        """
+        tpgol = TPGameOfLife(self.columns, self.rows, engine, 1, **options)
+        try:
+            for x, y, state in cells:
+                tpgol.set_state(x, y, state)
+            detector = CycleDetector(tpgol)
+            cycles = []
+            for tick in range(ticks):
+                tpgol.tick()
+                cycles.append(detector.update())
+            return cycles
+        finally:
+            tpgol.close()
+
+    def test_still_life(self):
+        block = [(5, 5, RED), (5, 6, RED), (6, 5, RED), (6, 6, RED)]
+        for engine, options in engines():
+            with self.subTest(engine=engine):
+                self.assertEqual(self.detect(engine, block, 3, **options),
+                                 [(0, 1)] * 3)
+
+    def test_blinker(self):
+        blinker = [(9, 8, RED), (10, 8, RED), (11, 8, RED)]
+        for engine, options in engines():
+            with self.subTest(engine=engine):
+                self.assertEqual(self.detect(engine, blinker, 4, **options),
+                                 [None, (0, 2), (0, 2), (0, 2)])
+
+    def test_extrapolation(self):
+        # Both soups settle into a cycle of period 2 well before the end,
+        # after the placements
+        generations = 301
+        placements = [(2, 5, 5), (20, 10, 3)]
+        for engine, options in engines():
+            for seed in (1, 5):
+                with self.subTest(engine=engine, seed=seed):
+                    tpgol = TPGameOfLife(self.columns, self.rows, engine,
+                                         seed, **options)
+                    full = TPGameOfLife(self.columns, self.rows, engine,
+                                        seed, **options)
+                    try:
+                        tpgol.set_states(soup(self.columns, self.rows, seed))
+                        full.set_states(tpgol.states())
+                        stats = run(tpgol, 3, 5, generations, placements)
+                        self.assertIsNotNone(stats['period'])
+                        self.assertIsNone(stats['win'])
+                        self.assertEqual(stats['generations'], generations)
+                        # The same placements, on dead cells only, then
+                        # every generation
+                        for generation in range(generations):
+                            for placed, x, y in placements:
+                                if (placed == generation and
+                                        full.get_state(x, y) == DEAD):
+                                    full.set_state(x, y, GREEN)
+                            full.tick()
+                        self.assertEqual(tpgol.states(), full.states())
+                        self.assertEqual(
+                            (stats['red'], stats['green']),
+                            (full.population(RED), full.population(GREEN)))
+                    finally:
+                        tpgol.close()
+                        full.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""Check that an Ensemble plays every board like a bounded SparseEngine with
+the board's seed.
+
+Run with:
+    python -m unittest test_ensemble
+"""
+import unittest
+
+from golg import Ensemble, TPGameOfLife
+from test_rules import soup
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RED = TPGameOfLife.RED
+GREEN = TPGameOfLife.GREEN
+
+# Seeds of 2^63 and up wrap to uint64 in the Ensemble, and must flip coins
+# like the Python ints coin_flip hashes
+SEEDS = [1, 2**63 + 5, 2**64 - 1]
+
+
+def blinker(columns: int, rows: int) -> bytes:
+    """Return the states of a board with a red blinker and a green block,
+    which has period 2 and no coin flips.
+    """
+    states = bytearray(columns * rows)
+    for x, y, state in [(2, 3, RED), (3, 3, RED), (4, 3, RED),
+                        (10, 10, GREEN), (10, 11, GREEN),
+                        (11, 10, GREEN), (11, 11, GREEN)]:
+        states[x*rows + y] = state
+    return bytes(states)
+
+
+@unittest.skipIf(np is None, 'Ensemble requires the numpy module')
+class EnsembleTest(unittest.TestCase):
+    """Ensembles against one bounded SparseEngine per board."""
+    columns = 23
+    rows = 17
+
+    def games(self, seeds, boards):
+        """Return a bounded sparse TPGameOfLife per seed and board."""
+        games = []
+        for seed, states in zip(seeds, boards):
+            tpgol = TPGameOfLife(self.columns, self.rows, 'sparse', seed,
+                                 topology='bounded')
+            tpgol.set_states(states)
+            games.append(tpgol)
+        return games
+
+    def test_tick(self):
+        columns, rows = self.columns, self.rows
+        boards = [soup(columns, rows, board) for board in range(len(SEEDS))]
+        ensemble = Ensemble(columns, rows, SEEDS)
+        for board, states in enumerate(boards):
+            ensemble.set_states(states, board)
+        games = self.games(SEEDS, boards)
+        flips = 0
+        for generation in range(30):
+            ensemble.tick()
+            for board, tpgol in enumerate(games):
+                tpgol.tick()
+                self.assertEqual(ensemble.states(board), tpgol.states(),
+                                 'seed {} differs at generation {}'.format(
+                                     SEEDS[board], generation+1))
+            flips += int(ensemble.flips.sum())
+        self.assertTrue(flips, 'no coin was flipped')
+
+    def test_run(self):
+        columns, rows = self.columns, self.rows
+        generations = 150
+        seeds = [7] + SEEDS
+        boards = [blinker(columns, rows)] + [
+            soup(columns, rows, board) for board in range(len(SEEDS))]
+        ensemble = Ensemble(columns, rows, seeds)
+        for board, states in enumerate(boards):
+            ensemble.set_states(states, board)
+        results = ensemble.run(generations, 4, 4)
+        self.assertEqual(results['period'][0], 2)
+        self.assertEqual(results['cycle_start'][0], 0)
+
+        for board, tpgol in enumerate(self.games(seeds, boards)):
+            end = results['generations'][board]
+            history = [tpgol.states()]
+            for generation in range(1, end+1):
+                tpgol.tick()
+                history.append(tpgol.states())
+                self.assertEqual(
+                    (results['red_curve'][generation, board],
+                     results['green_curve'][generation, board]),
+                    (tpgol.population(RED), tpgol.population(GREEN)),
+                    'board {} differs at generation {}'.format(
+                        board, generation))
+            self.assertEqual((results['red'][board],
+                              results['green'][board]),
+                             (tpgol.population(RED),
+                              tpgol.population(GREEN)))
+            period = results['period'][board]
+            if period:
+                start = results['cycle_start'][board]
+                self.assertEqual(history[start], history[start + period])
+                for shorter in range(1, period):
+                    self.assertNotEqual(history[start],
+                                        history[start + shorter])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+"""Check that games recorded with ReplayRecorder read back, seek and verify
+exactly.
+
+Run with:
+    python -m unittest test_replays
+"""
+import os
+import tempfile
+import unittest
+from typing import List
+
+from golg import ReplayReader, ReplayRecorder, Snapshot, TPGameOfLife
+from replay import verify
+from test_rules import soup
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEAD = TPGameOfLife.DEAD
+RED = TPGameOfLife.RED
+GREEN = TPGameOfLife.GREEN
+
+
+class ReplayTest(unittest.TestCase):
+    """Recorded games read back against what was recorded."""
+    columns = 23
+    rows = 17
+    generations = 60
+    keyframe_interval = 10
+    seed = 2**62 + 3
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'game.golr')
+
+    def record(self, tpgol: TPGameOfLife) -> List[Snapshot]:
+        """Record a game from the board of tpgol, placing a green cell on
+        the top dead cell of a column every seventh generation, and return
+        the frames recorded.
+        """
+        recorder = ReplayRecorder(self.path, tpgol, 3, 5,
+                                  self.keyframe_interval)
+        frames = []
+        placed = ()
+        births = 3
+        try:
+            for generation in range(self.generations):
+                if generation % 7 == 3:
+                    x = generation % tpgol.columns
+                    for y in reversed(range(tpgol.rows)):
+                        if tpgol.get_state(x, y) == DEAD:
+                            tpgol.set_state(x, y, GREEN)
+                            recorder.place(generation, x, y)
+                            placed += ((generation, x, y),)
+                            break
+                red = tpgol.population(RED)
+                green = tpgol.population(GREEN)
+                recorder.record(generation, tpgol.states(), births, red,
+                                green)
+                frames.append(Snapshot(generation, tpgol.states(), births,
+                                       red, green, placed, None))
+                tpgol.tick()
+        finally:
+            recorder.close()
+            tpgol.close()
+        self.assertTrue(placed, 'no cell was placed')
+        return frames
+
+    def check(self, engine: str, rule: str = 'p2life', states: bytes = None,
+              **options) -> ReplayReader:
+        """Record a game and check the replay against it, returning the
+        open ReplayReader.
+        """
+        tpgol = TPGameOfLife(self.columns, self.rows, engine, self.seed,
+                             rule, **options)
+        tpgol.set_states(states or soup(self.columns, self.rows, 1))
+        frames = self.record(tpgol)
+
+        reader = ReplayReader(self.path)
+        self.addCleanup(reader.close)
+        self.assertEqual((reader.columns, reader.rows, reader.engine,
+                          reader.rule, reader.options, reader.seed),
+                         (self.columns, self.rows, engine, rule, options,
+                          self.seed))
+        self.assertEqual(reader.generations, self.generations - 1)
+        self.assertEqual(reader.placements, list(frames[-1].placed))
+
+        scan = list(reader.frames(0))
+        self.assertEqual([frame[:6] for frame in scan],
+                         [frame[:6] for frame in frames])
+        for generation in range(self.generations):
+            self.assertEqual(reader.seek(generation), scan[generation],
+                             'seek({})'.format(generation))
+        self.assertEqual(reader.seek(self.generations + 5), scan[-1])
+        self.assertIsNone(verify(reader))
+        return reader
+
+    def test_python(self):
+        self.check('python')
+
+    def test_rule(self):
+        self.check('python', 'immigration')
+
+    @unittest.skipIf(np is None, 'the numpy engine requires numpy')
+    def test_quadlife(self):
+        self.check('numpy', 'quadlife')
+
+    def test_torus(self):
+        self.check('sparse', topology='torus')
+
+    def test_unbounded(self):
+        # A red glider that flies off the grid: the recorded populations
+        # must count it, so the game is never won
+        states = bytearray(self.columns * self.rows)
+        for x, y in [(1, 2), (2, 1), (3, 1), (3, 2), (3, 3)]:
+            states[x*self.rows + y] = RED
+        reader = self.check('sparse', states=bytes(states))
+        last = reader.seek(reader.generations)
+        self.assertNotIn(RED, last.states)
+        self.assertEqual(last.red, 5)
+        self.assertIsNone(reader.win)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+"""Check that the compiled p2life Rule, and every engine following it,
+agree with the hard-coded p2life function.
+
+Run with:
+    python -m unittest test_rules
+"""
+import random
+import unittest
+from typing import Tuple
+
+from golg import ENGINES, RULES, TPGameOfLife, coin_flip, p2life
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEAD = TPGameOfLife.DEAD
+RED = TPGameOfLife.RED
+GREEN = TPGameOfLife.GREEN
+
+# How each engine settles coin flips, as the reference has to as well
+FLIPS = {
+    'python': 'random',
+    'incremental': 'random',
+    'bitplane': 'random',
+    'numpy': 'numpy',
+    'hashlife': 'hash',
+    'parallel': 'hash',
+    'sparse': 'hash',
+}
+
+
+def soup(columns: int, rows: int, seed: int) -> bytes:
+    """Return the states of a random board, column by column."""
+    rng = random.Random(seed)
+    return bytes(rng.choice((DEAD, DEAD, RED, GREEN))
+                 for i in range(columns * rows))
+
+
+def reference_tick(states: bytes, columns: int, rows: int, flips: str,
+                   seed: int, generation: int, rng) -> Tuple[bytes, int]:
+    """Return the next generation of a board under the p2life function, and
+    the number of coin flips, settling them like the engines of the given
+    kind: 'random' draws from rng (a random.Random) cell by cell, 'numpy'
+    draws from rng (a NumPy Generator) for all flips at once, and 'hash'
+    uses coin_flip.
+    """
+    next_states = bytearray(len(states))
+    ties = []  # Positions of the cells decided by a coin flip, in order
+    for x in range(columns):
+        for y in range(rows):
+            counts = {RED: 0, GREEN: 0}
+            for n_x in (x-1, x, x+1):
+                for n_y in (y-1, y, y+1):
+                    if ((n_x, n_y) != (x, y) and 0 <= n_x < columns
+                            and 0 <= n_y < rows):
+                        state = states[n_x*rows + n_y]
+                        if state in counts:
+                            counts[state] += 1
+            state = p2life(states[x*rows + y], counts[RED], counts[GREEN])
+            if state is None:
+                ties.append((x, y))
+                if flips == 'random':
+                    state = (RED, GREEN)[rng.randint(1, 2) - 1]
+                elif flips == 'hash':
+                    state = coin_flip(seed, generation, x, y)
+                else:
+                    state = DEAD  # Drawn below
+            next_states[x*rows + y] = state
+    if flips == 'numpy' and ties:
+        draws = rng.integers(0, 2, len(ties))
+        for (x, y), draw in zip(ties, draws):
+            next_states[x*rows + y] = (RED, GREEN)[draw]
+    return bytes(next_states), len(ties)
+
+
+class CompiledTableTest(unittest.TestCase):
+    """The table of RULES['p2life'] against p2life."""
+
+    def test_table(self):
+        rule = RULES['p2life']
+        self.assertEqual(rule.ties, [(RED, GREEN)])
+        for state in (DEAD, RED, GREEN):
+            for red in range(9):
+                for green in range(9 - red):
+                    expected = p2life(state, red, green)
+                    entry = rule.table[state][red*rule.weights[RED]
+                                              + green*rule.weights[GREEN]]
+                    if expected is None:
+                        self.assertEqual(entry, -1, (state, red, green))
+                    else:
+                        self.assertEqual(entry, expected,
+                                         (state, red, green))
+
+
+class EngineTest(unittest.TestCase):
+    """Seeded runs of every engine against the p2life function."""
+    columns = 23
+    rows = 17
+    generations = 30
+
+    def check(self, engine: str, seed: int, **options) -> None:
+        columns, rows = self.columns, self.rows
+        flips = FLIPS[engine]
+        if flips == 'numpy':
+            rng = np.random.default_rng(seed)
+        else:
+            rng = random.Random(seed)
+        states = soup(columns, rows, seed)
+        tpgol = TPGameOfLife(columns, rows, engine, seed, **options)
+        try:
+            tpgol.set_states(states)
+            ties = 0
+            for generation in range(self.generations):
+                states, flipped = reference_tick(states, columns, rows,
+                                                 flips, seed, generation,
+                                                 rng)
+                ties += flipped
+                tpgol.tick()
+                self.assertEqual(tpgol.states(), states,
+                                 '{} differs at generation {}'.format(
+                                     engine, generation+1))
+        finally:
+            tpgol.close()
+        self.assertTrue(ties, 'no coin was flipped')
+
+    def test_engines(self):
+        for engine in ENGINES:
+            if engine == 'numpy' and np is None:
+                continue
+            options = {'topology': 'bounded'} if engine == 'sparse' else {}
+            for seed in (1, 2):
+                with self.subTest(engine=engine, seed=seed):
+                    self.check(engine, seed, **options)
+
+
+if __name__ == '__main__':
+    unittest.main()